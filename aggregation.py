@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Most points a single line, area or marker series is sent to the browser with
+POINT_BUDGET = int(os.environ.get('MAX_POINTS', 1000))
+
+# Most rows/columns a heatmap matrix is sent with; larger matrices are averaged down in blocks
+HEATMAP_MAX_CELLS = int(os.environ.get('HEATMAP_MAX_CELLS', 200))
+
+# Default number of bins for precomputed histograms
+HISTOGRAM_BINS = int(os.environ.get('HISTOGRAM_BINS', 20))
+
+
+# Function to precompute histogram bins, so only bin centres and counts go to the browser
+def histogram_bins(values, bins=HISTOGRAM_BINS):
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return np.array([]), np.array([]), np.array([])
+    counts, edges = np.histogram(values, bins=min(bins, max(values.size, 1)))
+    centres = (edges[:-1] + edges[1:]) / 2
+    return centres, counts, edges
+
+
+# Function to decimate a series to at most n_out points, keeping the minimum and maximum of each bucket
+def min_max_decimate(x, y, n_out):
+    x = np.asarray(x)
+    y = np.asarray(y, dtype='float64')
+    if len(x) <= n_out or n_out < 4:
+        return x, y
+    n_buckets = n_out // 2
+    edges = np.linspace(0, len(x), n_buckets + 1).astype(int)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    filled = np.where(np.isnan(y), -np.inf, y)
+    order_max = np.lexsort((-filled, bucket))
+    filled = np.where(np.isnan(y), np.inf, y)
+    order_min = np.lexsort((filled, bucket))
+    keep = np.unique(np.concatenate([order_max[edges[:-1]], order_min[edges[:-1]]]))
+    return x[keep], y[keep]
+
+
+# Function to decimate a series to at most n_out points with Largest-Triangle-Three-Buckets,
+# which keeps the visual shape of the line. Each bucket's triangle areas are computed in one NumPy step.
+def lttb(x, y, n_out):
+    x = np.asarray(x)
+    y = np.asarray(y, dtype='float64')
+    if len(x) <= n_out or n_out < 3:
+        return x, y
+    xf = x.astype('float64')
+    edges = np.linspace(1, len(x) - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, len(x) - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else len(x)
+        next_x = xf[next_start:next_end].mean()
+        next_y = np.nanmean(y[next_start:next_end]) if np.any(~np.isnan(y[next_start:next_end])) else y[previous]
+        areas = np.abs(
+            (xf[previous] - next_x) * (y[start:end] - y[previous])
+            - (xf[previous] - xf[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.nanargmax(areas)) if np.any(~np.isnan(areas)) else start
+        keep[i + 1] = previous
+    return x[keep], y[keep]
+
+
+# Function to downsample a long frame to the point budget, separately for each series in group_column
+def downsample(frame, x_column='Year', y_column='Value', group_column=None, budget=POINT_BUDGET, method=lttb):
+    if len(frame) <= budget:
+        return frame
+    if group_column is None:
+        x, y = method(frame[x_column].to_numpy(), frame[y_column].to_numpy(), budget)
+        return pd.DataFrame({x_column: x, y_column: y})
+    groups = frame.groupby(group_column, sort=False)
+    per_group = max(budget // max(groups.ngroups, 1), 3)
+    parts = []
+    for name, group in groups:
+        x, y = method(group[x_column].to_numpy(), group[y_column].to_numpy(), per_group)
+        parts.append(pd.DataFrame({x_column: x, y_column: y, group_column: name}))
+    return pd.concat(parts, ignore_index=True)
+
+
+# Function to average a matrix down in blocks so neither axis exceeds max_size
+def block_mean(matrix, labels, max_size, axis):
+    size = matrix.shape[axis]
+    if size <= max_size:
+        return matrix, labels
+    groups = np.arange(size) * max_size // size
+    sums = np.zeros((max_size, matrix.shape[1]) if axis == 0 else (matrix.shape[0], max_size))
+    counts = np.zeros_like(sums)
+    valid = ~np.isnan(matrix)
+    if axis == 0:
+        np.add.at(sums, groups, np.where(valid, matrix, 0))
+        np.add.at(counts, groups, valid)
+    else:
+        np.add.at(sums.T, groups, np.where(valid, matrix, 0).T)
+        np.add.at(counts.T, groups, valid.T)
+    with np.errstate(invalid='ignore'):
+        reduced = sums / counts
+    # Label each block with its first label
+    first = np.flatnonzero(np.r_[True, np.diff(groups) > 0])
+    return reduced, [labels[i] for i in first]
+
+
+# Function to pivot a long frame into a dense (row x column) matrix of mean values,
+# bounded to max_cells per axis, ready for a heatmap
+def pivot_matrix(frame, row_column, column_column, value_column, max_cells=HEATMAP_MAX_CELLS):
+    row_idx, rows = pd.factorize(frame[row_column], sort=True)
+    col_idx, columns = pd.factorize(frame[column_column], sort=True)
+    values = frame[value_column].to_numpy(dtype='float64')
+    valid = ~np.isnan(values)
+
+    sums = np.zeros((len(rows), len(columns)))
+    counts = np.zeros_like(sums)
+    np.add.at(sums, (row_idx[valid], col_idx[valid]), values[valid])
+    np.add.at(counts, (row_idx[valid], col_idx[valid]), 1)
+    with np.errstate(invalid='ignore'):
+        matrix = sums / counts
+
+    matrix, rows = block_mean(matrix, list(rows), max_cells, axis=0)
+    matrix, columns = block_mean(matrix, list(columns), max_cells, axis=1)
+    return matrix, rows, columns
@@ -0,0 +1,201 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Default window (years) for rolling volatility
+ROLLING_WINDOW = int(os.environ.get('ROLLING_WINDOW', 5))
+
+# Trend fits kept per snapshot, one per year range (least recently used dropped first). Each holds a fit of
+# every indicator, and the slider offers hundreds of ranges, so they aren't all kept.
+TREND_CACHE_SIZE = int(os.environ.get('TREND_CACHE_SIZE', 32))
+
+# Two-sided 95% critical values of Student's t for 1-30 degrees of freedom
+T_95 = np.array([
+    np.nan, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+])
+
+
+# Function to look up the 95% t critical value for an array of degrees of freedom (NaN below 1).
+# Past 30 the first-order expansion around the normal quantile is within 0.001 of the exact value.
+def t_critical(dof):
+    dof = np.asarray(dof)
+    table = T_95[np.clip(dof, 0, len(T_95) - 1)]
+    with np.errstate(divide='ignore'):
+        return np.where(dof < len(T_95), table, 1.96 + 2.37 / np.maximum(dof, 1))
+
+
+# Function to compute year-over-year changes along the year axis (NaN where either year is missing)
+def year_over_year(values):
+    changes = np.full(values.shape, np.nan)
+    changes[:, 1:] = values[:, 1:] - values[:, :-1]
+    return changes
+
+
+# Function to compute the rolling mean and sample standard deviation over window years, for every
+# indicator at once. A window needs a value in every year; the first window - 1 years are NaN.
+def rolling_stats(values, window):
+    mean = np.full(values.shape, np.nan)
+    std = np.full(values.shape, np.nan)
+    if window < 2 or window > values.shape[1]:
+        return mean, std
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=1)
+    complete = ~np.isnan(windows).any(axis=2)
+    with np.errstate(invalid='ignore'):
+        window_mean = windows.mean(axis=2)
+        window_std = windows.std(axis=2, ddof=1)
+    mean[:, window - 1:] = np.where(complete, window_mean, np.nan)
+    std[:, window - 1:] = np.where(complete, window_std, np.nan)
+    return mean, std
+
+
+# Function to compute z-scores of every value against its indicator's mean and standard deviation
+def z_scores(values):
+    counts = np.sum(~np.isnan(values), axis=1, keepdims=True)
+    filled = np.where(np.isnan(values), 0.0, values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=1, keepdims=True) / counts
+        deviations = np.where(np.isnan(values), 0.0, values - mean)
+        std = np.sqrt((deviations ** 2).sum(axis=1, keepdims=True) / (counts - 1))
+        return np.where(std > 0, (values - mean) / std, np.nan)
+
+
+# Function to fit a least-squares line to every indicator over the given years in one pass, skipping
+# missing values. Returns the slope, intercept, 95% half-width of the slope, and what trend_band needs.
+def trend_fit(years, values):
+    present = ~np.isnan(values)
+    x = np.where(present, years.astype('float64'), 0.0)
+    y = np.where(present, values, 0.0)
+    n = present.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = x.sum(axis=1) / n
+        y_mean = y.sum(axis=1) / n
+        dx = np.where(present, years - x_mean[:, None], 0.0)
+        sxx = (dx ** 2).sum(axis=1)
+        slope = (dx * y).sum(axis=1) / sxx
+        intercept = y_mean - slope * x_mean
+        residuals = np.where(present, values - (intercept[:, None] + slope[:, None] * years), 0.0)
+        # Residual variance, only defined with at least three points
+        variance = np.where(n > 2, (residuals ** 2).sum(axis=1) / (n - 2), np.nan)
+        t = t_critical(np.maximum(n - 2, 0))
+        slope_ci = t * np.sqrt(variance / sxx)
+    return {
+        'n': n, 'slope': slope, 'intercept': intercept, 'slope_ci': slope_ci,
+        'x_mean': x_mean, 'sxx': sxx, 'variance': variance, 't': t,
+    }
+
+
+# Function to evaluate fitted lines and their 95% confidence band of the mean at the given years
+def trend_band(fit, years):
+    fitted = fit['intercept'][:, None] + fit['slope'][:, None] * years
+    with np.errstate(invalid='ignore', divide='ignore'):
+        half_width = fit['t'][:, None] * np.sqrt(
+            fit['variance'][:, None] * (1 / fit['n'][:, None] + (years - fit['x_mean'][:, None]) ** 2 / fit['sxx'][:, None])
+        )
+    return fitted, fitted - half_width, fitted + half_width
+
+
+# Derived metrics for every indicator in an (indicator x year) matrix. Each metric is computed for all
+# indicators in one vectorized pass the first time it's asked for and reused afterwards, so one instance
+# per data snapshot serves every request against that snapshot.
+class IndicatorAnalytics:
+    def __init__(self, indicator_codes, years, values):
+        self.indicator_codes = list(indicator_codes)
+        self.years = np.asarray(years, dtype='int64')
+        self.values = np.asarray(values, dtype='float64')
+        self._index = {code: i for i, code in enumerate(self.indicator_codes)}
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._trends = OrderedDict()  # (start year, end year) -> fit, least recently used first
+
+    @classmethod
+    def from_store(cls, store):
+        return cls(*store.matrix())
+
+    def has_indicator(self, indicator_code):
+        return indicator_code in self._index
+
+    def year_over_year(self):
+        return self._cached(('yoy',), lambda: year_over_year(self.values))
+
+    def z_scores(self):
+        return self._cached(('z',), lambda: z_scores(self.values))
+
+    # (mean, std, coefficient of variation in %) over window years
+    def rolling(self, window=ROLLING_WINDOW):
+        def compute():
+            mean, std = rolling_stats(self.values, window)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                cv = np.where(np.abs(mean) > 0, 100 * std / np.abs(mean), np.nan)
+            return mean, std, cv
+        return self._cached(('rolling', window), compute)
+
+    # Trend fit of every indicator over start_year..end_year, plus the fitted line and band at each year.
+    # The last TREND_CACHE_SIZE year ranges asked for are kept.
+    def trend(self, start_year, end_year):
+        key = (start_year, end_year)
+        with self._lock:
+            fit = self._trends.get(key)
+            if fit is None:
+                columns = self._columns(start_year, end_year)
+                years = self.years[columns]
+                fit = trend_fit(years, self.values[:, columns])
+                fit['years'] = years
+                fit['fitted'], fit['lower'], fit['upper'] = trend_band(fit, years)
+                self._trends[key] = fit
+                while len(self._trends) > TREND_CACHE_SIZE:
+                    self._trends.popitem(last=False)
+            self._trends.move_to_end(key)
+            return fit
+
+    # Long frame (Year, Series, Value) of one indicator's year-over-year change and rolling standard
+    # deviation, with the coefficient of variation and z-score of each year for hover labels
+    def volatility_frame(self, indicator_code, start_year, end_year, window=ROLLING_WINDOW):
+        columns = ['Year', 'Series', 'Value', 'CV (%)', 'Z-score']
+        if indicator_code not in self._index:
+            return pd.DataFrame(columns=columns)
+        row = self._index[indicator_code]
+        positions = self._columns(start_year, end_year)
+        _, std, cv = self.rolling(window)
+        shared = {
+            'Year': self.years[positions],
+            'CV (%)': cv[row, positions].round(2),
+            'Z-score': self.z_scores()[row, positions].round(2),
+        }
+        frame = pd.concat([
+            pd.DataFrame({**shared, 'Series': 'Year-over-year change', 'Value': self.year_over_year()[row, positions]}),
+            pd.DataFrame({**shared, 'Series': f'{window}-year rolling std', 'Value': std[row, positions]}),
+        ], ignore_index=True)
+        frame['Value'] = frame['Value'].round(6)
+        return frame[columns]
+
+    # Frame (Year, Value, Fit, Lower, Upper) of one indicator's trend over the year range;
+    # the slope, its 95% half-width and the number of points are in frame.attrs
+    def trend_frame(self, indicator_code, start_year, end_year):
+        columns = ['Year', 'Value', 'Fit', 'Lower', 'Upper']
+        if indicator_code not in self._index:
+            return pd.DataFrame(columns=columns)
+        row = self._index[indicator_code]
+        fit = self.trend(start_year, end_year)
+        frame = pd.DataFrame({
+            'Year': fit['years'],
+            'Value': self.values[row, self._columns(start_year, end_year)],
+            'Fit': fit['fitted'][row],
+            'Lower': fit['lower'][row],
+            'Upper': fit['upper'][row],
+        }).round(6)
+        frame.attrs = {'slope': float(fit['slope'][row]), 'slope_ci': float(fit['slope_ci'][row]), 'n': int(fit['n'][row])}
+        return frame
+
+    def _columns(self, start_year, end_year):
+        return np.flatnonzero((self.years >= start_year) & (self.years <= end_year))
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
@@ -0,0 +1,112 @@
+// Browser-side year range handling (enabled with CLIENTSIDE_RANGE=1).
+// The server ships every chart rendered over the full year range once per indicator;
+// moving the year range slider re-slices those figures here without a server round trip.
+// Charts fitted to the selected years (the trend chart) aren't sliced; they stay server-rendered,
+// updated when the slider is released rather than while it is dragged.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    range: {
+        slice_figure: function(rangeFigures, selectedYears, graphId) {
+            var noUpdate = window.dash_clientside.no_update;
+            if (!rangeFigures || !selectedYears) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+            if (rangeFigures.error) {
+                return [{data: [], layout: {}}, {display: 'none'}, 'An error occurred: ' + rangeFigures.error];
+            }
+
+            var start = selectedYears[0];
+            var end = selectedYears[1];
+            var inRange = function(year) {
+                year = Number(year);
+                return year >= start && year <= end;
+            };
+            // Figures may arrive in the compact wire format (see assets/compact_figures.js)
+            var base = window.dashboardDecodeFigure(rangeFigures.figures[graphId], true);
+            var hasPoints = false;
+
+            var data = base.data.map(function(trace) {
+                var sliced = sliceTrace(trace, inRange, rangeFigures.series);
+                var points = pointCount(sliced);
+                if (points > 0) {
+                    hasPoints = true;
+                } else if (pointCount(trace) > 0) {
+                    sliced.visible = false;  // e.g. a bubble chart year that is now out of range
+                }
+                return sliced;
+            });
+
+            var layout = Object.assign({}, base.layout);
+            if (layout.title && layout.title.text) {
+                layout.title = Object.assign({}, layout.title, {
+                    text: layout.title.text.replace(/from \d{4} to \d{4}/, 'from ' + start + ' to ' + end)
+                });
+            }
+            if (!hasPoints) {
+                layout.annotations = [{text: 'No data available', x: 0.5, y: 0.5, showarrow: false, xref: 'paper', yref: 'paper'}];
+            }
+            return [{data: data, layout: layout}, {display: 'block'}, null];
+        }
+    }
+});
+
+// Keep only the entries at the given indices of every per-point array on an object
+function pickIndices(obj, length, indices) {
+    var out = Object.assign({}, obj);
+    Object.keys(obj).forEach(function(key) {
+        if (Array.isArray(obj[key]) && obj[key].length === length) {
+            out[key] = indices.map(function(i) { return obj[key][i]; });
+        }
+    });
+    return out;
+}
+
+// Slice one trace to the selected years, according to where the trace keeps its year
+function sliceTrace(trace, inRange, series) {
+    var indices;
+    if (trace.type === 'histogram') {
+        // The server sends precomputed bins; rebuild the input from the indicator's series and let Plotly bin it
+        var values = series.years.map(function(year, i) {
+            return inRange(year) ? series.values[i] : null;
+        }).filter(function(value) { return value !== null; });
+        var binned = Object.assign({}, trace, {x: values, histfunc: 'count'});
+        delete binned.y;
+        delete binned.xbins;
+        return binned;
+    }
+    if (trace.type === 'pie') {
+        indices = indexWhere(trace.labels, inRange);
+        return pickIndices(trace, trace.labels.length, indices);
+    }
+    if (trace.type === 'heatmap') {
+        indices = indexWhere(trace.y, inRange);
+        return Object.assign({}, trace, {
+            y: indices.map(function(i) { return trace.y[i]; }),
+            z: indices.map(function(i) { return trace.z[i]; })
+        });
+    }
+    if (!Array.isArray(trace.x)) {
+        return trace;
+    }
+    var length = trace.x.length;
+    indices = indexWhere(trace.x, inRange);
+    var sliced = pickIndices(trace, length, indices);
+    if (trace.marker) {
+        sliced.marker = pickIndices(trace.marker, length, indices);
+    }
+    return sliced;
+}
+
+function indexWhere(values, predicate) {
+    var indices = [];
+    (values || []).forEach(function(value, i) {
+        if (predicate(value)) {
+            indices.push(i);
+        }
+    });
+    return indices;
+}
+
+function pointCount(trace) {
+    var values = trace.type === 'pie' ? trace.labels : (trace.type === 'heatmap' ? trace.y : trace.x);
+    return Array.isArray(values) ? values.length : 0;
+}
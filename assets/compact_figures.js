@@ -0,0 +1,101 @@
+// Expands figures sent in the compact wire format (COMPACT_FIGURES=1, see wire_format.py) before Plotly
+// draws them: base64 typed arrays ({dtype, bdata, shape}) are decoded, and the layout template, sent once
+// with the page as window.dashboardFigureTemplate, is put back into each figure's layout.
+(function() {
+    var DTYPES = {
+        i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+        i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array
+    };
+
+    function isTypedArraySpec(value) {
+        return value !== null && typeof value === 'object' && typeof value.bdata === 'string' && DTYPES[value.dtype];
+    }
+
+    // Decode one typed array spec. float32 values are widened back to the shortest decimal that round-trips,
+    // so hover labels show 3.592 rather than 3.5920000076. With plain set, returns ordinary arrays.
+    function decodeArray(spec, plain) {
+        var bytes = Uint8Array.from(atob(spec.bdata), function(c) { return c.charCodeAt(0); });
+        var values = new DTYPES[spec.dtype](bytes.buffer);
+        if (spec.dtype === 'f4') {
+            values = Float64Array.from(values, function(v) { return parseFloat(v.toPrecision(7)); });
+        }
+        if (plain) {
+            values = Array.from(values, function(v) { return Number.isNaN(v) ? null : v; });
+        }
+        if (!spec.shape) {
+            return values;
+        }
+        var shape = String(spec.shape).split(',').map(Number);
+        var rows = [];
+        for (var i = 0; i < shape[0]; i++) {
+            rows.push(values.slice(i * shape[1], (i + 1) * shape[1]));
+        }
+        return rows;
+    }
+
+    // Copy of a trace (or any nested object in it) with every typed array spec decoded
+    function decodeObject(obj, plain) {
+        var out = {};
+        Object.keys(obj).forEach(function(key) {
+            var value = obj[key];
+            if (isTypedArraySpec(value)) {
+                out[key] = decodeArray(value, plain);
+            } else if (value !== null && typeof value === 'object' && !Array.isArray(value)) {
+                out[key] = decodeObject(value, plain);
+            } else {
+                out[key] = value;
+            }
+        });
+        return out;
+    }
+
+    // Figure with its data decoded and the shared template restored. Used by assets/clientside.js too,
+    // with plain set, since its slicing works on ordinary arrays.
+    window.dashboardDecodeFigure = function(figure, plain) {
+        if (!figure || !Array.isArray(figure.data)) {
+            return figure;
+        }
+        var layout = figure.layout || {};
+        if (!layout.template && window.dashboardFigureTemplate) {
+            layout = Object.assign({}, layout, {template: window.dashboardFigureTemplate});
+        }
+        return Object.assign({}, figure, {
+            data: figure.data.map(function(trace) { return decodeObject(trace, plain); }),
+            layout: layout
+        });
+    };
+
+    // dcc.Graph calls Plotly.react(gd, {data, layout, frames, config}) (or with separate arguments)
+    function wrap(Plotly) {
+        if (!Plotly || Plotly.dashboardCompact) {
+            return Plotly;
+        }
+        ['newPlot', 'react'].forEach(function(name) {
+            var original = Plotly[name];
+            Plotly[name] = function(gd, data, layout, config) {
+                if (data && !Array.isArray(data) && Array.isArray(data.data)) {
+                    return original.call(this, gd, window.dashboardDecodeFigure(data));
+                }
+                var figure = window.dashboardDecodeFigure({data: data || [], layout: layout});
+                return original.call(this, gd, figure.data, figure.layout, config);
+            };
+        });
+        Plotly.dashboardCompact = true;
+        return Plotly;
+    }
+
+    if (!window.dashboardFigureTemplate) {
+        return;  // Compact figures are off
+    }
+    if (window.Plotly) {
+        wrap(window.Plotly);
+    } else {
+        // dcc.Graph loads plotly.js on demand; wrap it as soon as it's assigned
+        var plotly;
+        Object.defineProperty(window, 'Plotly', {
+            configurable: true,
+            get: function() { return plotly; },
+            set: function(value) { plotly = wrap(value); }
+        });
+    }
+})();
@@ -0,0 +1,78 @@
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Repository root (the dashboard reads its data and assets relative to it)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DASHBOARD_PATH = os.path.join(ROOT, 'economic-dashboard.py')
+
+# Year ranges exercised by the benchmarks: the default view, a short window, and the full slider
+YEAR_RANGES = [[2010, 2022], [2018, 2022], [1980, 2022]]
+
+
+# Function to import economic-dashboard.py (its file name isn't a valid module name) as a module
+def load_dashboard(module_name='dashboard'):
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location(module_name, DASHBOARD_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Function to write a synthetically enlarged copy of data.csv: every row is repeated for `countries`
+# made-up countries, and unemployment rows are also repeated as `indicators` made-up indicator variants.
+# Values are scaled by random factors so aggregations aren't trivially identical.
+def write_enlarged_csv(path, countries=10, indicators=5, source=os.path.join(ROOT, 'data.csv'), seed=0):
+    data = pd.read_csv(source)
+    year_columns = [column for column in data.columns if column.isdigit()]
+    rng = np.random.default_rng(seed)
+
+    unemployment = data[data['Indicator Name'].str.contains('Unemployment|UEM', case=False)]
+    variants = [data]
+    for i in range(1, indicators):
+        variant = unemployment.copy()
+        variant['Indicator Code'] = variant['Indicator Code'] + f'.SYN{i}'
+        variant['Indicator Name'] = variant['Indicator Name'] + f' (synthetic {i})'
+        variants.append(variant)
+    base = pd.concat(variants, ignore_index=True)
+
+    frames = [base]
+    for i in range(1, countries):
+        country = base.copy()
+        country['Country Code'] = f'X{i:02d}'
+        country['Country Name'] = f'Synthetic Country {i}'
+        country[year_columns] = country[year_columns] * rng.uniform(0.5, 1.5, size=(len(country), 1))
+        frames.append(country)
+    pd.concat(frames, ignore_index=True).to_csv(path, index=False)
+    return path
+
+
+# Function to build a /_dash-update-component request body for one chart callback
+def update_request(dependency, selected_indicator, selected_years, rendered_view=None):
+    outputs = [
+        {'id': output.split('.')[0], 'property': output.split('.')[1]}
+        for output in dependency['output'].strip('.').split('...')
+    ]
+    values = {
+        'indicator-dropdown': selected_indicator,
+        'compare-dropdown': [selected_indicator],
+        'compare-layout': 'overlay',
+    }
+    inputs = [
+        {'id': i['id'], 'property': i['property'], 'value': values.get(i['id'], selected_years)}
+        for i in dependency['inputs']
+    ]
+    state = [{'id': s['id'], 'property': s['property'], 'value': rendered_view} for s in dependency['state']]
+    return {
+        'output': dependency['output'],
+        # Multi-output callbacks ("..a.figure...b.figure..") take a list, single-output ones a dict
+        'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+        'inputs': inputs,
+        'state': state,
+        'changedPropIds': [f"{inputs[0]['id']}.{inputs[0]['property']}"],
+    }
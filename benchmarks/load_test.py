@@ -0,0 +1,190 @@
+"""Drive the Dash _dash-update-component endpoint with N concurrent simulated users.
+
+    python benchmarks/load_test.py --users 20 --duration 30
+    python benchmarks/load_test.py --url http://127.0.0.1:8050 --users 50   # against a running server
+    python benchmarks/load_test.py --enlarge 20 5                           # in-process, enlarged data
+
+Without --url the dashboard is started in-process on a threaded WSGI server. Each user repeatedly
+picks an indicator and year range and fires every chart callback for it, as a page would.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import urllib.request
+
+from common import YEAR_RANGES, load_dashboard, update_request, write_enlarged_csv
+
+
+def post_json(url, body):
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode('utf-8'), headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return response.status, len(response.read())
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return json.loads(response.read())
+
+
+# Function to list up to limit indicators of a running dashboard. The layout's dropdown only carries every
+# option for small catalogs (DROPDOWN_MAX_OPTIONS); otherwise the rest are found through the dropdown's
+# server-side search, as a user typing search_value would.
+def remote_indicators(base_url, layout, search_value, limit):
+    dropdown = find_component(layout, 'indicator-dropdown')
+    indicators = [option['value'] for option in dropdown['props']['options']]
+    if len(indicators) < limit and search_value:
+        body = {
+            'output': 'indicator-dropdown.options',
+            'outputs': {'id': 'indicator-dropdown', 'property': 'options'},
+            'inputs': [{'id': 'indicator-dropdown', 'property': 'search_value', 'value': search_value}],
+            'state': [{'id': 'indicator-dropdown', 'property': 'value', 'value': dropdown['props'].get('value')}],
+            'changedPropIds': ['indicator-dropdown.search_value'],
+        }
+        request = urllib.request.Request(
+            f'{base_url}/_dash-update-component', data=json.dumps(body).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=60) as response:
+            # 204 (no update) means the layout already had every option
+            options = json.loads(response.read())['response']['indicator-dropdown']['options'] if response.status == 200 else []
+        indicators += [option['value'] for option in options if option['value'] not in indicators]
+    return indicators[:limit]
+
+
+# Function to start the dashboard on a background threaded WSGI server, returning its base URL and the module
+def start_server(port):
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # Don't log every request
+    dashboard = load_dashboard()
+    server = make_server('127.0.0.1', port, dashboard.app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server, dashboard
+
+
+# Function to run one simulated user until the deadline, recording per-request latencies
+def run_user(base_url, dependencies, indicators, ranges, deadline, seed, latencies, errors, payload_bytes):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        selected_indicator = rng.choice(indicators)
+        selected_years = rng.choice(ranges)
+        for dependency in dependencies:
+            body = update_request(dependency, selected_indicator, selected_years)
+            t = time.perf_counter()
+            try:
+                status, size = post_json(f'{base_url}/_dash-update-component', body)
+                if status >= 400:
+                    errors.append(status)
+                payload_bytes.append(size)
+            except Exception as e:
+                errors.append(str(e))
+            latencies.append(time.perf_counter() - t)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(int(round(q / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+# Function to find a component by id in a serialized Dash layout
+def find_component(node, component_id):
+    if isinstance(node, dict):
+        if node.get('props', {}).get('id') == component_id:
+            return node
+        children = node.get('props', {}).get('children')
+        return find_component(children, component_id)
+    if isinstance(node, list):
+        for child in node:
+            found = find_component(child, component_id)
+            if found is not None:
+                return found
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base URL of a running dashboard (default: start one in-process)')
+    parser.add_argument('--users', type=int, default=10, help='concurrent simulated users (default 10)')
+    parser.add_argument('--duration', type=float, default=20, help='seconds to run (default 20)')
+    parser.add_argument('--indicators', type=int, default=10, help='number of indicators users pick from (default 10)')
+    parser.add_argument('--search', default='unemployment',
+                        help='with --url, dropdown search used to find indicators beyond those in the layout (default "unemployment")')
+    parser.add_argument('--all-ranges', action='store_true',
+                        help='pick from every valid slider range instead of a few common ones')
+    parser.add_argument('--enlarge', nargs=2, type=int, metavar=('COUNTRIES', 'INDICATOR_VARIANTS'),
+                        help='in-process only: serve a synthetically enlarged copy of data.csv')
+    parser.add_argument('--port', type=int, default=0, help='port for the in-process server (default: any free port)')
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = dashboard = None
+        base_url = args.url
+        if not base_url:
+            os.environ['DATA_CACHE_DIR'] = os.path.join(workdir, 'data-cache')
+            if args.enlarge:
+                os.environ['DATA_CSV'] = write_enlarged_csv(os.path.join(workdir, 'enlarged.csv'), *args.enlarge)
+                os.environ.pop('COMPARISON_DATA', None)
+            base_url, server, dashboard = start_server(args.port)
+
+        layout = get_json(f'{base_url}/_dash-layout')
+        # Server-side chart callbacks only (the indicator searches only run while typing in a dropdown)
+        dependencies = [
+            d for d in get_json(f'{base_url}/_dash-dependencies')
+            if not d.get('clientside_function') and not d['output'].endswith('-dropdown.options')
+        ]
+        if dashboard is not None:
+            indicators = dashboard.data_source.snapshot.indicators()[:args.indicators]
+        else:
+            indicators = remote_indicators(base_url, layout, args.search, args.indicators)
+        if args.all_ranges:
+            ranges = [[start, end] for start in range(1980, 2023) for end in range(start, 2023)]
+        else:
+            ranges = YEAR_RANGES
+
+        latencies, errors, payload_bytes = [], [], []
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        users = [
+            threading.Thread(target=run_user, args=(
+                base_url, dependencies, indicators, ranges, deadline, seed, latencies, errors, payload_bytes
+            ))
+            for seed in range(args.users)
+        ]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - started
+        if server is not None:
+            server.shutdown()
+
+    results = {
+        'users': args.users,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'mean_payload_bytes': round(statistics.fmean(payload_bytes)) if payload_bytes else 0,
+    }
+    for name, value in results.items():
+        print(f'{name}: {value}')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
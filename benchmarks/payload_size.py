@@ -0,0 +1,108 @@
+"""Compare figure payloads before and after the compact wire format (COMPACT_FIGURES), offline.
+
+    python benchmarks/payload_size.py                  # against the bundled data.csv
+    python benchmarks/payload_size.py --enlarge 20 5   # against data.csv x 20 countries x 5 indicator variants
+
+For every indicator x year range, each chart's figure is encoded the way a callback response is, as plain
+JSON figures and in the compact format, with the standard library json encoder and (if installed) orjson.
+Reports response bytes (raw and gzipped) and encoding time for a full view, and what compaction itself costs.
+"""
+import argparse
+import gzip
+import importlib.util
+import json
+import os
+import tempfile
+import time
+
+from plotly.io.json import to_json_plotly
+
+from common import YEAR_RANGES, load_dashboard, write_enlarged_csv
+from run_benchmarks import print_results, summarize
+
+
+# Function to time encoding a view's response, returning (seconds per encode, raw bytes, gzipped bytes)
+def encode_view(figures, engine, repeat):
+    response = {'multi': True, 'response': {graph_id: {'figure': figure} for graph_id, figure in figures.items()}}
+    timings = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        text = to_json_plotly(response, engine=engine)
+        timings.append(time.perf_counter() - t)
+    body = text.encode('utf-8')
+    return timings, len(body), len(gzip.compress(body))
+
+
+def bench_payloads(dashboard, indicators, repeat):
+    from figure_cache import serialize_figure
+    from wire_format import compact_figure, shared_template
+
+    template = shared_template()
+    engines = ['json'] + (['orjson'] if importlib.util.find_spec('orjson') else [])
+    variants = {f'{form}/{engine}': {'encode': [], 'bytes': [], 'gzip_bytes': []} for form in ('plain', 'compact') for engine in engines}
+    compaction = []
+
+    snapshot = dashboard.data_source.snapshot
+    for selected_indicator in indicators:
+        for start_year, end_year in YEAR_RANGES:
+            plain = {
+                graph_id: serialize_figure(builder(
+                    snapshot.chart_data(source, selected_indicator, start_year, end_year), selected_indicator, [start_year, end_year]
+                ))
+                for graph_id, (builder, source) in dashboard.CHART_BUILDERS.items()
+            }
+            t = time.perf_counter()
+            compact = {graph_id: compact_figure(figure, template) for graph_id, figure in plain.items()}
+            compaction.append(time.perf_counter() - t)
+
+            for form, figures in (('plain', plain), ('compact', compact)):
+                for engine in engines:
+                    timings, size, gzip_size = encode_view(figures, engine, repeat)
+                    results = variants[f'{form}/{engine}']
+                    results['encode'] += timings
+                    results['bytes'].append(size)
+                    results['gzip_bytes'].append(gzip_size)
+
+    baseline = variants['plain/json']
+    baseline_bytes = sum(baseline['bytes'])
+    baseline_encode = sum(baseline['encode'])
+    report = {}
+    for name, results in variants.items():
+        report[name] = {
+            'view_bytes_mean': round(sum(results['bytes']) / len(results['bytes'])),
+            'view_gzip_bytes_mean': round(sum(results['gzip_bytes']) / len(results['gzip_bytes'])),
+            'encode': summarize(results['encode']),
+            'bytes_vs_plain_json': f"{sum(results['bytes']) / baseline_bytes:.1%}",
+            'encode_time_vs_plain_json': f"{sum(results['encode']) / baseline_encode:.1%}",
+        }
+    report['compaction_per_view'] = summarize(compaction)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--enlarge', nargs=2, type=int, metavar=('COUNTRIES', 'INDICATOR_VARIANTS'),
+                        help='benchmark against a synthetically enlarged copy of data.csv')
+    parser.add_argument('--indicators', type=int, default=5, help='number of indicators in the matrix (default 5)')
+    parser.add_argument('--repeat', type=int, default=5, help='encodes of each view per variant (default 5)')
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['DATA_CACHE_DIR'] = os.path.join(workdir, 'data-cache')
+        os.environ.pop('FIGURE_CACHE_DIR', None)
+        if args.enlarge:
+            os.environ['DATA_CSV'] = write_enlarged_csv(os.path.join(workdir, 'enlarged.csv'), *args.enlarge)
+            os.environ.pop('COMPARISON_DATA', None)
+        dashboard = load_dashboard()
+        indicators = dashboard.data_source.snapshot.indicators()[:args.indicators]
+        results = {'payloads': bench_payloads(dashboard, indicators, args.repeat)}
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
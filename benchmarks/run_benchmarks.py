@@ -0,0 +1,212 @@
+"""Time startup, each figure builder, the full set of chart callbacks and the key indicator cards, offline.
+
+    python benchmarks/run_benchmarks.py                  # against the bundled data.csv
+    python benchmarks/run_benchmarks.py --enlarge 20 5   # against data.csv x 20 countries x 5 indicator variants
+
+Memory is measured in a separate final pass, so allocation tracing doesn't inflate the timings.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import ROOT, YEAR_RANGES, load_dashboard, write_enlarged_csv
+
+
+# Function to summarise a list of timings (seconds) as milliseconds
+def summarize(timings):
+    timings = sorted(timings)
+    return {
+        'n': len(timings),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(timings[0] * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+    }
+
+
+# Function to time importing the dashboard in a fresh interpreter, returning (seconds, max RSS in MB)
+def time_import(env):
+    code = (
+        "import resource, sys, time; sys.path.insert(0, 'benchmarks'); t = time.perf_counter();"
+        "from common import load_dashboard; load_dashboard();"
+        "print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+    )
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    seconds, max_rss_kb = output.stdout.split()[-2:]
+    return float(seconds), int(max_rss_kb) / 1024
+
+
+def bench_startup(repeat, cache_dir):
+    env = dict(os.environ, DATA_CACHE_DIR=cache_dir)
+    results = {}
+    # The first run builds the binary data cache; later runs load it
+    cold_seconds, cold_rss = time_import(env)
+    warm = [time_import(env) for _ in range(repeat)]
+    results['import_cold_cache'] = {'seconds': round(cold_seconds, 3), 'max_rss_mb': round(cold_rss, 1)}
+    results['import_warm_cache'] = {
+        **summarize([seconds for seconds, _ in warm]),
+        'max_rss_mb': round(max(rss for _, rss in warm), 1),
+    }
+    no_cache = [time_import(dict(env, DATA_CACHE_DIR='')) for _ in range(repeat)]
+    results['import_no_cache'] = {
+        **summarize([seconds for seconds, _ in no_cache]),
+        'max_rss_mb': round(max(rss for _, rss in no_cache), 1),
+    }
+    return results
+
+
+# Function to drop a snapshot's cached slices (the analytics matrices are per-snapshot and stay warm)
+def clear_slices(snapshot):
+    for source in (snapshot.plot_data, snapshot.comparison_data, snapshot.volatility_data, snapshot.trend_data):
+        source.cache_clear()
+
+
+# Function to time every builder, serialization, and the full view of every chart across indicators x ranges
+def bench_figures(dashboard, indicators, repeat):
+    from figure_cache import serialize_figure
+
+    builders = {graph_id: [] for graph_id in dashboard.CHART_BUILDERS}
+    serialization = {graph_id: [] for graph_id in dashboard.CHART_BUILDERS}
+    slicing, full_cold, full_warm = [], [], []
+
+    snapshot = dashboard.data_source.snapshot
+    for _ in range(repeat):
+        for selected_indicator in indicators:
+            for selected_years in YEAR_RANGES:
+                start_year, end_year = selected_years
+                clear_slices(snapshot)
+                t = time.perf_counter()
+                chart_data = {
+                    source: snapshot.chart_data(source, selected_indicator, start_year, end_year)
+                    for source in {source for _, source in dashboard.CHART_BUILDERS.values()}
+                }
+                slicing.append(time.perf_counter() - t)
+
+                for graph_id, (builder, source) in dashboard.CHART_BUILDERS.items():
+                    data = chart_data[source]
+                    t = time.perf_counter()
+                    fig = builder(data, selected_indicator, selected_years)
+                    builders[graph_id].append(time.perf_counter() - t)
+                    t = time.perf_counter()
+                    serialize_figure(fig)
+                    serialization[graph_id].append(time.perf_counter() - t)
+
+                # Full view as the callbacks see it: cold (nothing cached), then warm (figure cache hit)
+                dashboard.figure_cache.clear()
+                clear_slices(snapshot)
+                t = time.perf_counter()
+                dashboard.build_figures(selected_indicator, selected_years)
+                full_cold.append(time.perf_counter() - t)
+                t = time.perf_counter()
+                dashboard.build_figures(selected_indicator, selected_years)
+                full_warm.append(time.perf_counter() - t)
+
+    return {
+        'slice': summarize(slicing),
+        'builders': {graph_id: summarize(timings) for graph_id, timings in builders.items()},
+        'serialization': {graph_id: summarize(timings) for graph_id, timings in serialization.items()},
+        'all_charts_cold': summarize(full_cold),
+        'all_charts_warm': summarize(full_warm),
+    }
+
+
+# Function to time the key indicator cards: building the latest-value index, a get_latest_value lookup,
+# and the whole cards row
+def bench_latest_values(dashboard, repeat):
+    store = dashboard.data_source.snapshot.store
+    index_build, lookups, cards = [], [], []
+    for _ in range(repeat):
+        store.__dict__.pop('latest_values', None)
+        t = time.perf_counter()
+        store.latest_values
+        index_build.append(time.perf_counter() - t)
+        for indicator_name in dashboard.KEY_INDICATORS:
+            t = time.perf_counter()
+            dashboard.get_latest_value(indicator_name)
+            lookups.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        dashboard.key_indicators_row()
+        cards.append(time.perf_counter() - t)
+    return {
+        'latest_value_index_build': summarize(index_build),
+        'get_latest_value': summarize(lookups),
+        'key_indicators_row': summarize(cards),
+    }
+
+
+# Function to measure memory in a pass of its own, since tracing allocations slows everything it traces
+# several times over: the Python heap peak of building every chart cold, and the process's RSS high-water mark
+def bench_memory(dashboard, indicators):
+    snapshot = dashboard.data_source.snapshot
+    dashboard.figure_cache.clear()
+    clear_slices(snapshot)
+    tracemalloc.start()
+    for selected_indicator in indicators:
+        for selected_years in YEAR_RANGES:
+            dashboard.build_figures(selected_indicator, selected_years)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'python_heap_peak_mb': round(peak / 1024 / 1024, 1),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def print_results(results):
+    for section, values in results.items():
+        print(f'\n== {section}')
+        for name, value in values.items():
+            if isinstance(value, dict) and all(isinstance(v, dict) for v in value.values()):
+                for sub_name, sub_value in value.items():
+                    print(f'  {name}/{sub_name}: {sub_value}')
+            else:
+                print(f'  {name}: {value}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--enlarge', nargs=2, type=int, metavar=('COUNTRIES', 'INDICATOR_VARIANTS'),
+                        help='benchmark against a synthetically enlarged copy of data.csv')
+    parser.add_argument('--indicators', type=int, default=5, help='number of indicators in the matrix (default 5)')
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions of each measurement (default 3)')
+    parser.add_argument('--skip-startup', action='store_true', help='skip the import/startup timings')
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['DATA_CACHE_DIR'] = os.path.join(workdir, 'data-cache')
+        os.environ.pop('FIGURE_CACHE_DIR', None)
+        if args.enlarge:
+            csv_path = write_enlarged_csv(os.path.join(workdir, 'enlarged.csv'), *args.enlarge)
+            os.environ['DATA_CSV'] = csv_path
+            os.environ.pop('COMPARISON_DATA', None)
+
+        results = {}
+        if not args.skip_startup:
+            results['startup'] = bench_startup(args.repeat, os.environ['DATA_CACHE_DIR'])
+        dashboard = load_dashboard()
+        snapshot = dashboard.data_source.snapshot
+        results['figures'] = bench_figures(dashboard, snapshot.indicators()[:args.indicators], args.repeat)
+        results['cards'] = bench_latest_values(dashboard, args.repeat)
+        results['memory'] = bench_memory(dashboard, snapshot.indicators()[:args.indicators])
+        results['data'] = {
+            'csv': os.environ.get('DATA_CSV', 'data.csv'),
+            'indicators': len(snapshot.indicators()),
+            'comparison_countries': len(snapshot.cube.country_codes),
+        }
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
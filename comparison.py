@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import ID_COLUMNS, file_hash, write_cache
+
+# Bump when the layout of the binary cube cache changes so old caches are rebuilt
+CUBE_FORMAT_VERSION = 1
+
+
+# Dense (country x indicator x year) cube of World Bank indicator values for cross-country comparisons.
+# Values are float32 with NaN for missing observations; every operation works on whole slices at once.
+class IndicatorCube:
+    def __init__(self, values, country_codes, country_names, indicator_codes, indicator_names, years, source_hash=None):
+        self.values = values
+        self.country_codes = list(country_codes)
+        self.country_names = dict(zip(self.country_codes, country_names))
+        self.indicator_codes = list(indicator_codes)
+        self.indicator_names = dict(zip(self.indicator_codes, indicator_names))
+        self.years = np.asarray(years, dtype='int16')
+        self.source_hash = source_hash
+        self._country_index = {code: i for i, code in enumerate(self.country_codes)}
+        self._indicator_index = {code: i for i, code in enumerate(self.indicator_codes)}
+
+    # Build the cube from a wide World Bank frame (one row per country/indicator, one column per year)
+    @classmethod
+    def from_wide(cls, wide_data, source_hash=None):
+        year_columns = [column for column in wide_data.columns if column not in ID_COLUMNS]
+        country_idx, country_codes = pd.factorize(wide_data['Country Code'])
+        indicator_idx, indicator_codes = pd.factorize(wide_data['Indicator Code'])
+        country_names = wide_data.drop_duplicates('Country Code').set_index('Country Code')['Country Name']
+        indicator_names = wide_data.drop_duplicates('Indicator Code').set_index('Indicator Code')['Indicator Name']
+
+        values = np.full((len(country_codes), len(indicator_codes), len(year_columns)), np.nan, dtype='float32')
+        values[country_idx, indicator_idx] = wide_data[year_columns].to_numpy(dtype='float32')
+        return cls(
+            values,
+            country_codes,
+            country_names.loc[country_codes].tolist(),
+            indicator_codes,
+            indicator_names.loc[indicator_codes].tolist(),
+            [int(year) for year in year_columns],
+            source_hash,
+        )
+
+    def has_country(self, country_code):
+        return country_code in self._country_index
+
+    def has_indicator(self, indicator_code):
+        return indicator_code in self._indicator_index
+
+    # Positions of the given country codes in the cube (unknown codes are skipped); None means every country
+    def country_positions(self, country_codes=None):
+        if country_codes is None:
+            return np.arange(len(self.country_codes))
+        return np.array([self._country_index[code] for code in country_codes if code in self._country_index], dtype='intp')
+
+    # Positions of the years between start_year and end_year (inclusive)
+    def year_positions(self, start_year=None, end_year=None):
+        start_year = self.years[0] if start_year is None else start_year
+        end_year = self.years[-1] if end_year is None else end_year
+        return np.flatnonzero((self.years >= start_year) & (self.years <= end_year))
+
+    # (country x year) matrix for one indicator; a view into the cube when no countries are selected
+    def matrix(self, indicator_code, country_codes=None):
+        matrix = self.values[:, self._indicator_index[indicator_code], :]
+        return matrix if country_codes is None else matrix[self.country_positions(country_codes)]
+
+    def series(self, country_code, indicator_code):
+        return self.values[self._country_index[country_code], self._indicator_index[indicator_code], :]
+
+    # Rank of every country for one indicator in each year (1 = highest value); NaN where there is no value
+    def ranks(self, indicator_code, country_codes=None):
+        matrix = self.matrix(indicator_code, country_codes)
+        missing = np.isnan(matrix)
+        order = np.argsort(np.where(missing, np.inf, -matrix), axis=0, kind='stable')
+        ranks = np.empty(matrix.shape, dtype='float32')
+        np.put_along_axis(ranks, order, np.arange(1, matrix.shape[0] + 1, dtype='float32')[:, None], axis=0)
+        ranks[missing] = np.nan
+        return ranks
+
+    # Percentile (0-100) of every country for one indicator in each year, among the countries with a value that year
+    def percentiles(self, indicator_code, country_codes=None):
+        ranks = self.ranks(indicator_code, country_codes)
+        reporting = np.sum(~np.isnan(ranks), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            percentiles = 100.0 * (reporting - ranks) / np.maximum(reporting - 1, 1)
+        return percentiles.astype('float32')
+
+    # Median of one indicator across a peer group, per year (NaN where no peer reports a value)
+    def peer_median(self, indicator_code, peer_codes=None):
+        matrix = self.matrix(indicator_code, peer_codes)
+        result = np.full(matrix.shape[1], np.nan, dtype='float32')
+        reporting = ~np.all(np.isnan(matrix), axis=0)
+        if reporting.any():
+            result[reporting] = np.nanmedian(matrix[:, reporting], axis=0)
+        return result
+
+    # Difference between a country and the peer-group median, per year
+    def difference_from_peers(self, country_code, indicator_code, peer_codes=None):
+        return self.series(country_code, indicator_code) - self.peer_median(indicator_code, peer_codes)
+
+    # Long frame (Year, Series, Value) of a country against its peer-group median, ready for plotting
+    def compare(self, country_code, indicator_code, peer_codes=None, start_year=None, end_year=None):
+        columns = ['Year', 'Series', 'Value']
+        if not (self.has_country(country_code) and self.has_indicator(indicator_code)):
+            return pd.DataFrame(columns=columns)
+        if peer_codes is None:
+            peer_codes = [code for code in self.country_codes if code != country_code]
+        positions = self.year_positions(start_year, end_year)
+        years = self.years[positions].astype(int)
+
+        frames = [pd.DataFrame({
+            'Year': years,
+            'Series': self.country_names[country_code],
+            'Value': self.series(country_code, indicator_code)[positions],
+        })]
+        if len(self.country_positions(peer_codes)):
+            frames.append(pd.DataFrame({
+                'Year': years,
+                'Series': 'Peer median',
+                'Value': self.peer_median(indicator_code, peer_codes)[positions],
+            }))
+        frame = pd.concat(frames, ignore_index=True)
+        frame['Value'] = frame['Value'].astype('float64').round(6)
+        return frame[columns]
+
+    # Short hash of one indicator's values across every country, for cache keys (see IndicatorStore.indicator_version)
+    def indicator_version(self, indicator_code):
+        versions = self.__dict__.setdefault('_versions', {})
+        version = versions.get(indicator_code)
+        if version is None:
+            content = '|'.join(self.country_codes).encode('utf-8')
+            if self.has_indicator(indicator_code):
+                content += np.ascontiguousarray(self.matrix(indicator_code)).tobytes()
+            version = versions[indicator_code] = hashlib.sha1(content).hexdigest()[:12]
+        return version
+
+    # Return a new cube with the values of the given wide rows replaced and removed (country, indicator) keys
+    # blanked, or None if a row introduces a country, indicator or year the cube doesn't have (reload instead)
+    def replace_rows(self, wide_rows, removed_keys=(), source_hash=None):
+        year_columns = [column for column in wide_rows.columns if column not in ID_COLUMNS]
+        if [int(year) for year in year_columns] != self.years.astype(int).tolist():
+            return None
+        keys = list(zip(wide_rows['Country Code'], wide_rows['Indicator Code'])) + list(removed_keys)
+        if any(not (self.has_country(country) and self.has_indicator(indicator)) for country, indicator in keys):
+            return None
+
+        values = np.array(self.values)
+        if len(wide_rows):
+            country_idx = [self._country_index[code] for code in wide_rows['Country Code']]
+            indicator_idx = [self._indicator_index[code] for code in wide_rows['Indicator Code']]
+            values[country_idx, indicator_idx] = wide_rows[year_columns].to_numpy(dtype='float32')
+        for country, indicator in removed_keys:
+            values[self._country_index[country], self._indicator_index[indicator]] = np.nan
+        return IndicatorCube(
+            values,
+            self.country_codes,
+            [self.country_names[code] for code in self.country_codes],
+            self.indicator_codes,
+            [self.indicator_names[code] for code in self.indicator_codes],
+            self.years,
+            source_hash,
+        )
+
+    # Write the cube as a .npy array plus a JSON manifest, so it can be memory-mapped back (see write_cache)
+    def save(self, cache_path):
+        manifest = {
+            'version': CUBE_FORMAT_VERSION,
+            'source_hash': self.source_hash,
+            'country_codes': self.country_codes,
+            'country_names': [self.country_names[code] for code in self.country_codes],
+            'indicator_codes': self.indicator_codes,
+            'indicator_names': [self.indicator_names[code] for code in self.indicator_codes],
+            'years': self.years.astype(int).tolist(),
+        }
+        write_cache(cache_path, {'values': self.values}, manifest)
+
+    # Load a cube written by save(); the values are memory-mapped read-only and shared across workers
+    @classmethod
+    def load(cls, cache_path):
+        with open(os.path.join(cache_path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != CUBE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache version in {cache_path}")
+        values = np.load(os.path.join(cache_path, 'values.npy'), mmap_mode='r')
+        return cls(
+            values,
+            manifest['country_codes'],
+            manifest['country_names'],
+            manifest['indicator_codes'],
+            manifest['indicator_names'],
+            manifest['years'],
+            manifest['source_hash'],
+        )
+
+
+# Function to read one or more World Bank CSV extracts, keeping only the requested countries and indicators
+def read_wide_csvs(paths, country_codes=None, indicator_codes=None):
+    frames = []
+    for path in paths:
+        data = pd.read_csv(path)
+        if country_codes is not None:
+            data = data[data['Country Code'].isin(country_codes)]
+        if indicator_codes is not None:
+            data = data[data['Indicator Code'].isin(indicator_codes)]
+        frames.append(data)
+    return pd.concat(frames, ignore_index=True).drop_duplicates(['Country Code', 'Indicator Code'], keep='last')
+
+
+# Function to load the comparison cube for the given CSV extracts, countries and indicators (None = all).
+# With a cache_dir the cube is memory-mapped from a binary cache keyed by the sources and the selection.
+def load_comparison_cube(paths, country_codes=None, indicator_codes=None, cache_dir=None):
+    source_hash = hashlib.sha1('|'.join(file_hash(path) for path in paths).encode('utf-8')).hexdigest()
+    if not cache_dir:
+        return IndicatorCube.from_wide(read_wide_csvs(paths, country_codes, indicator_codes), source_hash)
+
+    selection = [sorted(country_codes) if country_codes is not None else None,
+                 sorted(indicator_codes) if indicator_codes is not None else None]
+    cache_key = hashlib.sha1(f'cube|{source_hash}|{json.dumps(selection)}'.encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, cache_key)
+    try:
+        return IndicatorCube.load(cache_path)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    cube = IndicatorCube.from_wide(read_wide_csvs(paths, country_codes, indicator_codes), source_hash)
+    try:
+        cube.save(cache_path)
+    except OSError:
+        pass
+    return cube
@@ -0,0 +1,303 @@
+import glob
+import hashlib
+import io
+import logging
+import os
+import threading
+from functools import cached_property, lru_cache
+
+import pandas as pd
+
+from analytics import IndicatorAnalytics
+from comparison import load_comparison_cube
+from query_engine import load_indicator_database
+from data_store import UNEMPLOYMENT_KEYWORDS, filter_unemployment, load_unemployment_store
+
+logger = logging.getLogger('dashboard.data')
+
+# Columns that identify one row of a World Bank extract
+ROW_KEY = ['Country Code', 'Indicator Code']
+
+# Earliest year offered on the year range slider
+SLIDER_MIN_YEAR = 1980
+
+
+# Immutable view of the data at one point in time. Callbacks grab the current snapshot once and use it
+# throughout, so a reload in the middle of a request never mixes old and new data.
+class DataSnapshot:
+    def __init__(self, store, cube, version, comparison_country='KOR', comparison_peers=None, sources=(), cache_dir=None):
+        self.store = store
+        self.cube = cube
+        self.version = version
+        self.comparison_country = comparison_country
+        self.comparison_peers = comparison_peers
+        # CSV extracts behind the snapshot's query database
+        self.sources = list(sources)
+        self.cache_dir = cache_dir
+        # Slices shared by every chart callback, so all the charts for one view cost a single lookup per source
+        self.plot_data = lru_cache(maxsize=64)(self._plot_data)
+        self.comparison_data = lru_cache(maxsize=64)(self._comparison_data)
+        self.volatility_data = lru_cache(maxsize=64)(self._volatility_data)
+        self.trend_data = lru_cache(maxsize=64)(self._trend_data)
+        self._sources = {
+            'indicator': self.plot_data,
+            'comparison': self.comparison_data,
+            'volatility': self.volatility_data,
+            'trend': self.trend_data,
+        }
+
+    # Derived metrics (YoY, rolling volatility, z-scores, trends) of every indicator, computed in batched
+    # passes over the snapshot's (indicator x year) matrix and kept for the snapshot's lifetime
+    @cached_property
+    def analytics(self):
+        return IndicatorAnalytics.from_store(self.store)
+
+    # SQLite database of every observation in the snapshot's sources, for ad-hoc queries (see query_engine.py).
+    # Built on first use and cached on disk by a hash of the sources, like the other data caches.
+    @cached_property
+    def database(self):
+        return load_indicator_database(self.sources, self.cache_dir)
+
+    # The frame a chart is built from, by the data source named in CHART_BUILDERS
+    def chart_data(self, source, indicator_name, start_year, end_year):
+        return self._sources[source](indicator_name, start_year, end_year)
+
+    # Names of every indicator in the snapshot, in source order
+    def indicators(self):
+        return self.store.names()
+
+    # (first, last) year the year range slider offers for this snapshot
+    def slider_bounds(self):
+        return max(SLIDER_MIN_YEAR, self.store.min_year), self.store.max_year
+
+    # Version of one indicator's data (store and comparison cube); it only changes when that indicator does
+    def indicator_version(self, indicator_name):
+        code = self.store.code_for(indicator_name)
+        return f'{self.store.indicator_version(code)}-{self.cube.indicator_version(code)}'
+
+    def _plot_data(self, indicator_name, start_year, end_year):
+        return self.store.slice(self.store.code_for(indicator_name), start_year, end_year)
+
+    def _comparison_data(self, indicator_name, start_year, end_year):
+        return self.cube.compare(
+            self.comparison_country, self.store.code_for(indicator_name), self.comparison_peers, start_year, end_year
+        )
+
+    def _volatility_data(self, indicator_name, start_year, end_year):
+        return self.analytics.volatility_frame(self.store.code_for(indicator_name), start_year, end_year)
+
+    def _trend_data(self, indicator_name, start_year, end_year):
+        return self.analytics.trend_frame(self.store.code_for(indicator_name), start_year, end_year)
+
+
+# Function to resolve a data path: a CSV file as is, or the newest CSV in a directory of drops
+def resolve_source(path):
+    if not os.path.isdir(path):
+        return path
+    drops = glob.glob(os.path.join(path, '*.csv'))
+    if not drops:
+        raise FileNotFoundError(f"No CSV files in {path}")
+    return max(drops, key=lambda drop: (os.path.getmtime(drop), drop))
+
+
+def line_hash(line):
+    return hashlib.sha1(line).digest()
+
+
+# Owns the current snapshot and swaps in a new one when the source changes. The source is either
+# a CSV file or a directory of drops (newest CSV wins). Once watched, the raw lines of the source are
+# indexed by hash, so a refresh only parses the rows that were added or changed and rebuilds only the
+# indicators they touch; a changed header (e.g. a new year column) falls back to a full parse.
+class DataSource:
+    def __init__(self, path, comparison_paths=None, country_code='KOR', keywords=UNEMPLOYMENT_KEYWORDS,
+                 cache_dir=None, comparison_country='KOR', comparison_peers=None):
+        self.path = path
+        # None means compare against the data source itself (and follow it when it changes)
+        self.comparison_paths = comparison_paths
+        self.country_code = country_code
+        self.keywords = keywords
+        self.cache_dir = cache_dir
+        self.comparison_country = comparison_country
+        self.comparison_peers = comparison_peers
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stop = threading.Event()
+        self._watcher = None
+        self._header = None
+        self._row_keys = None  # line hash -> (country code, indicator code) for the current source
+        # Set when the source on disk no longer matches the snapshot (it changed between loading and
+        # indexing it), so the next refresh reloads in full rather than diffing against the newer index
+        self._stale = False
+        self._source_stat = self._stat(resolve_source(path))
+        self._comparison_stats = self._stats(comparison_paths or [])
+        self.snapshot = self._load_full(resolve_source(path), version=1)
+
+    # Data source configured from the environment (DATA_CSV, INDICATOR_KEYWORDS, COMPARISON_DATA,
+    # DATA_CACHE_DIR, COMPARISON_COUNTRY, COMPARISON_PEERS), shared by the dashboard and the static export
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get('DATA_CSV', 'data.csv'),
+            keywords=[keyword for keyword in os.environ.get('INDICATOR_KEYWORDS', '').split(',') if keyword]
+            or UNEMPLOYMENT_KEYWORDS,
+            comparison_paths=[path for path in os.environ.get('COMPARISON_DATA', '').split(',') if path] or None,
+            cache_dir=os.environ.get('DATA_CACHE_DIR', '.data_cache'),
+            comparison_country=os.environ.get('COMPARISON_COUNTRY', 'KOR'),
+            comparison_peers=[code for code in os.environ.get('COMPARISON_PEERS', '').split(',') if code] or None,
+        )
+
+    # Call listener(old_snapshot, new_snapshot, changed_indicator_names) after every swap
+    def on_change(self, listener):
+        self._listeners.append(listener)
+
+    # Poll the source every interval seconds in a background thread. Call again in a forked worker process
+    # (threads don't survive a fork) to restart it there.
+    def watch(self, interval):
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        with self._lock:
+            if self._row_keys is None:
+                self._index_source(resolve_source(self.path), self.snapshot)
+        if self._stale:
+            self.refresh()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='data-source-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # Check the source and swap in a new snapshot if it changed; returns the changed indicator names (None if unchanged)
+    def refresh(self):
+        with self._lock:
+            source = resolve_source(self.path)
+            source_stat = self._stat(source)
+            comparison_stats = self._stats(self.comparison_paths or [])
+            if source_stat == self._source_stat and comparison_stats == self._comparison_stats and not self._stale:
+                return None
+
+            old = self.snapshot
+            if comparison_stats != self._comparison_stats or self._row_keys is None or self._stale:
+                new = self._load_full(source, old.version + 1)
+                changed = set(old.indicators()) | set(new.indicators())
+            else:
+                new, changed = self._load_changes(source, old)
+            self._source_stat = source_stat
+            self._comparison_stats = comparison_stats
+            if new is None:
+                return None
+            self.snapshot = new
+
+        logger.info('Loaded data snapshot %s from %s (%d indicators changed)', new.version, source, len(changed))
+        for listener in self._listeners:
+            listener(old, new, changed)
+        return changed
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the current snapshot; a half-written drop is picked up on the next poll
+                logger.exception('Failed to reload data from %s', self.path)
+
+    def _load_full(self, source, version):
+        store = load_unemployment_store(source, self.country_code, self.keywords, cache_dir=self.cache_dir)
+        cube = load_comparison_cube(
+            self.comparison_paths or [source], indicator_codes=list(store.indicator_names), cache_dir=self.cache_dir
+        )
+        snapshot = self._snapshot(store, cube, version, source)
+        self._stale = False
+        if self._row_keys is not None:
+            self._index_source(source, snapshot)
+        return snapshot
+
+    # Index the source's rows by line hash, with a cheap two-column parse to get each row's key. The index
+    # must describe the same bytes as snapshot; if the file changed since snapshot was loaded from it,
+    # it's marked stale so the next refresh reloads it in full.
+    def _index_source(self, source, snapshot):
+        with open(source, 'rb') as f:
+            data = f.read()
+        lines = [line for line in data.splitlines() if line.strip()]
+        keys = pd.read_csv(io.BytesIO(data), usecols=ROW_KEY, dtype=str)
+        self._stale = hashlib.sha1(data).hexdigest() != snapshot.store.source_hash
+        if len(keys) != len(lines) - 1:
+            # Quoted newlines inside a row; line hashes can't be mapped to rows, so always reload in full
+            self._header, self._row_keys = None, None
+            return
+        self._header = lines[0]
+        self._row_keys = dict(zip(map(line_hash, lines[1:]), zip(keys['Country Code'], keys['Indicator Code'])))
+
+    # Parse only the new or changed lines of the source and patch them into the current snapshot.
+    # The row index is only updated once the new snapshot is built, so a failed attempt is retried in full.
+    def _load_changes(self, source, old):
+        with open(source, 'rb') as f:
+            data = f.read()
+        lines = [line for line in data.splitlines() if line.strip()]
+        if not lines or lines[0] != self._header:
+            new = self._load_full(source, old.version + 1)
+            return new, set(old.indicators()) | set(new.indicators())
+
+        hashes = [line_hash(line) for line in lines[1:]]
+        changed_lines = [line for line, digest in zip(lines[1:], hashes) if digest not in self._row_keys]
+        if changed_lines:
+            rows = pd.read_csv(io.BytesIO(b'\n'.join([lines[0]] + changed_lines)), dtype={key: str for key in ROW_KEY})
+        else:
+            rows = pd.read_csv(io.BytesIO(lines[0]), dtype={key: str for key in ROW_KEY})
+        if len(rows) != len(changed_lines):
+            new = self._load_full(source, old.version + 1)
+            return new, set(old.indicators()) | set(new.indicators())
+
+        kept_keys = {self._row_keys[digest] for digest in hashes if digest in self._row_keys}
+        changed_keys = set(zip(rows['Country Code'], rows['Indicator Code']))
+        removed_keys = set(self._row_keys.values()) - kept_keys - changed_keys
+        row_keys = {digest: self._row_keys[digest] for digest in hashes if digest in self._row_keys}
+        row_keys.update(zip(map(line_hash, changed_lines), zip(rows['Country Code'], rows['Indicator Code'])))
+        if not changed_keys and not removed_keys:
+            self._row_keys = row_keys
+            return None, set()
+        source_hash = hashlib.sha1(data).hexdigest()
+
+        # Indicators of the dashboard's country that changed, appeared, or stopped matching the keywords
+        store_rows = filter_unemployment(rows, self.country_code, self.keywords)
+        touched_codes = {code for country, code in changed_keys | removed_keys if country == self.country_code}
+        store_removed = {code for code in touched_codes if code in old.store.indicator_names} - set(store_rows['Indicator Code'])
+        store = old.store
+        if len(store_rows) or store_removed:
+            store = old.store.replace_rows(store_rows, store_removed, source_hash)
+
+        cube = old.cube
+        if self.comparison_paths is None:
+            cube_rows = rows[rows['Indicator Code'].isin(store.indicator_names)]
+            cube_removed = [key for key in removed_keys if key[1] in old.cube.indicator_names]
+            if set(store.indicator_names) != set(old.store.indicator_names):
+                cube = None
+            elif len(cube_rows) or cube_removed:
+                cube = old.cube.replace_rows(cube_rows, cube_removed, source_hash)
+            if cube is None:
+                cube = load_comparison_cube([source], indicator_codes=list(store.indicator_names), cache_dir=self.cache_dir)
+
+        changed_codes = {code for _, code in changed_keys | removed_keys}
+        changed = {
+            names[code] for names in (old.store.indicator_names, store.indicator_names) for code in changed_codes
+            if code in names
+        }
+        new = self._snapshot(store, cube, old.version + 1, source)
+        self._row_keys = row_keys
+        return new, changed
+
+    def _snapshot(self, store, cube, version, source):
+        return DataSnapshot(
+            store, cube, version, self.comparison_country, self.comparison_peers,
+            sources=self.comparison_paths or [source], cache_dir=self.cache_dir,
+        )
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def _stats(self, paths):
+        return [self._stat(path) for path in paths]
@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+# Columns that describe a row in the World Bank wide format (everything else is a year column)
+ID_COLUMNS = ['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code']
+
+# Keywords used to pick out unemployment-related indicators
+UNEMPLOYMENT_KEYWORDS = ["Unemployment", "UEM"]
+
+# Bump when the layout of the binary cache changes so old caches are rebuilt
+CACHE_FORMAT_VERSION = 1
+
+# Arrays written to the binary cache, one .npy file each
+CACHE_ARRAYS = ['indicator', 'country', 'year', 'value']
+
+
+# Function to turn the wide World Bank frame (one column per year) into a tidy, typed long frame
+def melt_to_long(wide_data):
+    year_columns = [column for column in wide_data.columns if column not in ID_COLUMNS]
+    values = wide_data[year_columns].to_numpy(dtype='float32')
+    n_rows, n_years = values.shape
+
+    long_data = pd.DataFrame({
+        'Country Name': np.repeat(wide_data['Country Name'].to_numpy(), n_years),
+        'Country Code': np.repeat(wide_data['Country Code'].to_numpy(), n_years),
+        'Indicator Code': np.repeat(wide_data['Indicator Code'].to_numpy(), n_years),
+        'Year': np.tile(np.array(year_columns, dtype='int16'), n_rows),
+        'Value': values.ravel(),
+    })
+    long_data['Country Name'] = long_data['Country Name'].astype('category')
+    long_data['Country Code'] = long_data['Country Code'].astype('category')
+    long_data['Indicator Code'] = long_data['Indicator Code'].astype('category')
+    return long_data
+
+
+# Long-format store of indicator values, indexed on (indicator code, year) for cheap range slices
+class IndicatorStore:
+    # data must already be indexed on (Indicator Code, Year) and sorted; use from_long/from_wide otherwise
+    def __init__(self, data, indicator_names, source_hash=None):
+        self.data = data
+        self.source_hash = source_hash
+        # Indicator name <-> code lookups, in the order the indicators appear in the source file
+        self.indicator_names = dict(indicator_names)
+        self.indicator_codes = {name: code for code, name in self.indicator_names.items()}
+        years = self.data.index.get_level_values('Year')
+        self.min_year = int(years.min()) if len(years) else None
+        self.max_year = int(years.max()) if len(years) else None
+
+    @classmethod
+    def from_long(cls, long_data, indicator_names, source_hash=None):
+        return cls(long_data.set_index(['Indicator Code', 'Year']).sort_index(), indicator_names, source_hash)
+
+    @classmethod
+    def from_wide(cls, wide_data, source_hash=None):
+        indicator_names = wide_data[['Indicator Code', 'Indicator Name']].drop_duplicates('Indicator Code')
+        return cls.from_long(
+            melt_to_long(wide_data),
+            zip(indicator_names['Indicator Code'], indicator_names['Indicator Name']),
+            source_hash,
+        )
+
+    # Names of all indicators in the store, in source order
+    def names(self):
+        return list(self.indicator_names.values())
+
+    def code_for(self, indicator_name):
+        return self.indicator_codes.get(indicator_name)
+
+    # Return the rows for one indicator between start_year and end_year (inclusive)
+    def slice(self, indicator_code, start_year, end_year):
+        if indicator_code not in self.indicator_names:
+            return self._frame(self.data.iloc[0:0])
+        return self._frame(self.data.loc[(indicator_code, slice(start_year, end_year)), :])
+
+    # Return the rows for several indicators between start_year and end_year (inclusive) in one lookup,
+    # grouped by indicator in the order given; unknown codes are skipped
+    def slice_many(self, indicator_codes, start_year, end_year):
+        codes = [code for code in dict.fromkeys(indicator_codes) if code in self.indicator_names]
+        if not codes:
+            return self._frame(self.data.iloc[0:0])
+        rows = self._frame(self.data.loc[(codes, slice(start_year, end_year)), :])
+        order = rows['Indicator Code'].map({code: i for i, code in enumerate(codes)})
+        return rows.iloc[np.argsort(order.to_numpy(), kind='stable')].reset_index(drop=True)
+
+    # Latest non-null observation of every indicator: code -> (value, year).
+    # Computed in one vectorized pass over the whole store the first time it's needed, then reused.
+    @cached_property
+    def latest_values(self):
+        return latest_observations(self.data)
+
+    # Short hash of one indicator's values; it changes exactly when that indicator's data changes,
+    # so it can go into cache keys to keep cached figures of unchanged indicators valid across reloads
+    def indicator_version(self, indicator_code):
+        versions = self.__dict__.setdefault('_versions', {})
+        version = versions.get(indicator_code)
+        if version is None:
+            if indicator_code in self.indicator_names:
+                rows = self.data.loc[(indicator_code, slice(None)), 'Value']
+                content = rows.index.get_level_values('Year').to_numpy().tobytes() + rows.to_numpy().tobytes()
+            else:
+                content = b''
+            version = versions[indicator_code] = hashlib.sha1(content).hexdigest()[:12]
+        return version
+
+    # Return a new store with the indicators in wide_rows replaced (or added) and removed_codes dropped.
+    # Latest values of untouched indicators are carried over rather than recomputed.
+    def replace_rows(self, wide_rows, removed_codes=(), source_hash=None):
+        replaced = set(removed_codes) | set(wide_rows['Indicator Code'])
+        kept = self.data[~self.data.index.get_level_values('Indicator Code').isin(replaced)].reset_index()
+        frames = [frame for frame in (kept, melt_to_long(wide_rows)) if len(frame)]
+        long_data = pd.concat(frames, ignore_index=True) if frames else kept
+        for column in ['Country Name', 'Country Code', 'Indicator Code']:
+            long_data[column] = long_data[column].astype(str).astype('category')
+
+        indicator_names = {code: name for code, name in self.indicator_names.items() if code not in removed_codes}
+        indicator_names.update(zip(wide_rows['Indicator Code'], wide_rows['Indicator Name']))
+        store = IndicatorStore.from_long(long_data, indicator_names.items(), source_hash)
+
+        if 'latest_values' in self.__dict__:
+            latest = {code: value for code, value in self.latest_values.items() if code not in replaced}
+            changed = store.data[store.data.index.get_level_values('Indicator Code').isin(replaced)]
+            latest.update(latest_observations(changed))
+            store.latest_values = latest
+        return store
+
+    # Dense (indicator x year) matrix of every indicator over min_year..max_year, NaN where missing.
+    # Returns (indicator codes in source order, years, float64 matrix).
+    def matrix(self):
+        codes = list(self.indicator_names)
+        years = np.arange(self.min_year, self.max_year + 1) if self.min_year is not None else np.array([], dtype=int)
+        values = np.full((len(codes), len(years)), np.nan)
+        rows = pd.Index(codes).get_indexer(self.data.index.get_level_values('Indicator Code').astype(str))
+        columns = self.data.index.get_level_values('Year').to_numpy().astype(int) - (self.min_year or 0)
+        values[rows, columns] = self.data['Value'].to_numpy(dtype='float64')
+        return codes, years, values
+
+    # Return one indicator's full series as plain lists (None for missing years), ready to ship to the browser
+    def series(self, indicator_code):
+        rows = self.slice(indicator_code, self.min_year, self.max_year)
+        values = rows['Value'].astype(object).where(rows['Value'].notna(), None)
+        return {'years': rows['Year'].astype(int).tolist(), 'values': values.tolist()}
+
+    # Flatten a slice of the indexed frame back into plain columns for plotting.
+    # Values are widened back to float64 and rounded so float32 noise (e.g. 3.5999999) doesn't leak into hover labels.
+    def _frame(self, rows):
+        frame = rows.reset_index()
+        for column in ['Country Name', 'Country Code', 'Indicator Code']:
+            frame[column] = frame[column].astype(object)
+        frame['Indicator Name'] = frame['Indicator Code'].map(self.indicator_names).astype(object)
+        frame['Value'] = frame['Value'].astype('float64').round(6)
+        return frame
+
+    # Write the store as flat .npy arrays plus a small JSON manifest, so it can be memory-mapped back.
+    # Everything is written to a temporary directory that is then moved into place (see publish_cache).
+    def save(self, cache_path):
+        indicator_index = self.data.index.get_level_values('Indicator Code')
+        country_names = self.data['Country Name'].cat
+        arrays = {
+            'indicator': indicator_index.codes.astype('int16'),
+            'country': country_names.codes.to_numpy().astype('int16'),
+            'year': self.data.index.get_level_values('Year').to_numpy().astype('int16'),
+            'value': self.data['Value'].to_numpy(dtype='float32'),
+        }
+        country_code_for = dict(zip(self.data['Country Name'].astype(str), self.data['Country Code'].astype(str)))
+        manifest = {
+            'version': CACHE_FORMAT_VERSION,
+            'source_hash': self.source_hash,
+            'indicator_categories': [str(code) for code in indicator_index.categories],
+            'country_names': [str(name) for name in country_names.categories],
+            'country_codes': [country_code_for.get(str(name)) for name in country_names.categories],
+            'indicator_names': [[code, name] for code, name in self.indicator_names.items()],
+        }
+        write_cache(cache_path, arrays, manifest)
+
+    # Load a store written by save(). The value and year arrays are memory-mapped read-only,
+    # so forked workers share the same pages instead of each holding a private copy.
+    @classmethod
+    def load(cls, cache_path):
+        with open(os.path.join(cache_path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != CACHE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache version in {cache_path}")
+        arrays = {name: np.load(os.path.join(cache_path, f'{name}.npy'), mmap_mode='r') for name in CACHE_ARRAYS}
+
+        index = pd.MultiIndex.from_arrays(
+            [
+                pd.Categorical.from_codes(arrays['indicator'], categories=manifest['indicator_categories']),
+                arrays['year'],
+            ],
+            names=['Indicator Code', 'Year'],
+        )
+        country_names = pd.Categorical.from_codes(arrays['country'], categories=manifest['country_names'])
+        country_codes = pd.Categorical.from_codes(arrays['country'], categories=manifest['country_codes'])
+        data = pd.DataFrame(
+            {'Country Name': country_names, 'Country Code': country_codes, 'Value': arrays['value']},
+            index=index,
+            copy=False,
+        )
+        return cls(data, manifest['indicator_names'], manifest['source_hash'])
+
+
+# Function to find the latest non-null (value, year) of every indicator in an indexed frame, in one pass
+def latest_observations(data):
+    observed = data[data['Value'].notna()]
+    # Rows are sorted by (indicator, year), so the last observed row per indicator is its latest year
+    last_rows = observed.groupby(level='Indicator Code', observed=True, sort=False).tail(1)
+    codes = last_rows.index.get_level_values('Indicator Code').astype(str)
+    years = last_rows.index.get_level_values('Year').astype(int)
+    values = last_rows['Value'].astype('float64').round(6)
+    return {code: (float(value), int(year)) for code, value, year in zip(codes, values, years)}
+
+
+# Function to write a binary cache (.npy arrays plus manifest.json) to cache_path. Other processes may have
+# the files of an existing cache memory-mapped, and overwriting them in place would truncate pages under
+# those maps, so the cache is written to a fresh temporary directory and only then moved into place.
+def write_cache(cache_path, arrays, manifest):
+    parent = os.path.dirname(os.path.abspath(cache_path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent, prefix=f'{os.path.basename(cache_path)}.', suffix='.tmp')
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        publish_cache(tmp_path, cache_path, manifest['version'])
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+# Function to move a complete cache directory from tmp_path to cache_path. If another process already
+# published a cache of this format version there, it is kept and the new copy dropped. An incomplete or
+# outdated one is moved aside and deleted first; processes mapping its files keep them until they unmap.
+def publish_cache(tmp_path, cache_path, version):
+    try:
+        os.rename(tmp_path, cache_path)
+        return
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(cache_path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            if json.load(f).get('version') == version:
+                return
+    except (OSError, ValueError):
+        pass
+    stale_path = f'{tmp_path}.stale'
+    os.rename(cache_path, stale_path)
+    os.rename(tmp_path, cache_path)
+    shutil.rmtree(stale_path, ignore_errors=True)
+
+
+# Function to hash a source file, so caches built from it can be matched to it later
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function to keep one country's unemployment-related indicators from a wide frame
+def filter_unemployment(data, country_code='KOR', keywords=UNEMPLOYMENT_KEYWORDS):
+    data_country = data[data['Country Code'] == country_code]
+    return data_country[data_country['Indicator Name'].str.contains('|'.join(keywords), case=False)]
+
+
+# Function to read the dataset and keep one country's unemployment-related indicators (wide format)
+def read_unemployment_csv(path='data.csv', country_code='KOR', keywords=UNEMPLOYMENT_KEYWORDS):
+    return filter_unemployment(pd.read_csv(path), country_code, keywords)
+
+
+# Function to load the unemployment indicator store for one country.
+# With a cache_dir, the filtered store is kept as memory-mappable arrays keyed by a hash of the CSV
+# and the filter, and rebuilt automatically whenever either changes; without one the CSV is parsed.
+def load_unemployment_store(path='data.csv', country_code='KOR', keywords=UNEMPLOYMENT_KEYWORDS, cache_dir=None):
+    source_hash = file_hash(path)
+    if not cache_dir:
+        return IndicatorStore.from_wide(read_unemployment_csv(path, country_code, keywords), source_hash)
+
+    cache_key = hashlib.sha1(f'{source_hash}|{country_code}|{"|".join(keywords)}'.encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, cache_key)
+    try:
+        return IndicatorStore.load(cache_path)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    store = IndicatorStore.from_wide(read_unemployment_csv(path, country_code, keywords), source_hash)
+    try:
+        store.save(cache_path)
+    except OSError:
+        # A read-only or full disk just means every worker parses the CSV, as before
+        pass
+    return store
+
+
+# Build step: python data_store.py [data.csv] [cache dir]
+if __name__ == '__main__':
+    source_path = sys.argv[1] if len(sys.argv) > 1 else 'data.csv'
+    target_dir = sys.argv[2] if len(sys.argv) > 2 else os.environ.get('DATA_CACHE_DIR', '.data_cache')
+    built_store = load_unemployment_store(source_path, cache_dir=target_dir)
+    print(f"Cached {len(built_store.indicator_names)} indicators from {source_path} in {target_dir}")
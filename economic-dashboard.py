@@ -1,30 +1,97 @@
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output
-import plotly.express as px
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import plotly.graph_objs as go
-import pandas as pd
-import base64
+import os
+import threading
+from functools import lru_cache
 import dash_bootstrap_components as dbc
+from flask import jsonify, request
+from plotly.io.json import to_json_plotly
+from data_source import DataSource
+from export import StaticExport
+from jobs import single_flight
+from static_assets import CompressedPayload, StaticAssets
+from wire_format import compact_figure, dumps, shared_template
+from figure_cache import FigureCache, serialize_figure
+from figures import (
+    CHART_BUILDERS, COMPARE_CHARTS, build_indicator_trace, build_query_figure, compose_compare_figure, figure_fingerprint,
+)
+from query_engine import QueryError
+import metrics
+
+# South Korea's unemployment-related indicators, plus a cross-country cube of the same indicators for the
+# "Comparison with National Trends" chart, served as immutable snapshots by the data source.
+# With DATA_CACHE_DIR set (default .data_cache) both are memory-mapped from binary caches keyed by a hash
+# of the CSV, so workers skip the CSV parse and share pages. DATA_CSV may also be a directory of drops
+# (the newest CSV wins). COMPARISON_DATA lists World Bank CSV extracts (comma separated) to compare
+# against; COMPARISON_PEERS optionally restricts the peer group to some country codes (default: every
+# other country loaded).
+data_source = DataSource.from_env()
+
+# Opt-in compact wire format for figures (see wire_format.py): numeric trace data is sent as base64 typed
+# arrays (float32 where it loses nothing visible) and the layout template is sent once with the page instead
+# of with every figure. assets/compact_figures.js expands figures again in the browser before they're drawn.
+COMPACT_FIGURES = os.environ.get('COMPACT_FIGURES', '').lower() in ('1', 'true', 'yes')
+figure_template = shared_template() if COMPACT_FIGURES else None
+
+# Cache of fully styled, serialized figures keyed by (chart, indicator, year range, indicator version).
+# FIGURE_CACHE_SIZE counts charts, not views: a view is one entry per chart in CHART_BUILDERS, and the
+# comparison charts add one per selected indicator. Set FIGURE_CACHE_DIR to keep a copy on disk (at most
+# FIGURE_CACHE_DIR_MAX_MB, least recently used files pruned first) so the cache survives worker restarts.
+# Disk entries are keyed by the figure code and settings too, so a deploy doesn't serve figures of the old code.
+figure_cache = FigureCache(
+    max_entries=int(os.environ.get('FIGURE_CACHE_SIZE', 256)),
+    disk_dir=os.environ.get('FIGURE_CACHE_DIR'),
+    namespace='compact' if COMPACT_FIGURES else '',
+    max_disk_bytes=int(os.environ.get('FIGURE_CACHE_DIR_MAX_MB', 512)) * 1024 * 1024,
+    fingerprint=figure_fingerprint('wire_format') if COMPACT_FIGURES else figure_fingerprint(),
+)
 
-# Load the dataset
-data = pd.read_csv('data.csv')
-
-# Filter for South Korea
-data_korea = data[data['Country Code'] == 'KOR']
-
-# Filter for unemployment-related indicators
-unemployment_keywords = ["Unemployment", "UEM"]  # Keywords to filter unemployment-related indicators
-data_unemployment = data_korea[data_korea['Indicator Name'].str.contains('|'.join(unemployment_keywords), case=False)]
-
-# Get unique unemployment indicators and years
-unemployment_indicators = data_unemployment['Indicator Name'].unique().tolist()
-
-# Load background image
-background_image = base64.b64encode(open('./assets/world-map.svg', 'rb').read()).decode('ascii')
-
-# Load logo image
-logo_image = base64.b64encode(open('./assets/logo.svg', 'rb').read()).decode('ascii')
+# Figures prerendered by export.py; when STATIC_EXPORT_DIR is set, views exported from the same data
+# version are served from there instead of being built
+static_export = StaticExport(os.environ['STATIC_EXPORT_DIR']) if os.environ.get('STATIC_EXPORT_DIR') else None
+
+# With DATA_RELOAD_INTERVAL (seconds) set, the data source is polled and a new snapshot swapped in when it
+# changes. Only the changed indicators get a new version, so every other cached figure stays valid; the
+# changed ones are dropped from memory right away instead of waiting to age out.
+# serve.py imports the app in the gunicorn master, which never serves requests, and sets SERVE_PRELOAD;
+# the watcher is then started in each worker after the fork instead (see post_fork there).
+DATA_RELOAD_INTERVAL = float(os.environ.get('DATA_RELOAD_INTERVAL', 0))
+data_source.on_change(lambda old, new, changed: figure_cache.invalidate(lambda key: key[1] in changed))
+if not os.environ.get('SERVE_PRELOAD'):
+    data_source.watch(DATA_RELOAD_INTERVAL)
+
+# Opt-in browser-side handling of year range changes: only indicator changes reach the server
+CLIENTSIDE_RANGE = os.environ.get('CLIENTSIDE_RANGE', '').lower() in ('1', 'true', 'yes')
+
+# Charts fitted to the selected years (the trend line, its band and slope) can't be cut down from the
+# full-range figure, so they keep a server callback in clientside mode, on the slider's released value
+RANGE_FITTED_CHARTS = [graph_id for graph_id, (_, source) in CHART_BUILDERS.items() if source == 'trend']
+
+# Opt-in background-callback mode: each view is rendered in a separate process (Dash background callbacks
+# with a local diskcache queue) while the page shows progress, so a slow view can't tie up a server thread.
+# Results are shared for BACKGROUND_RESULT_TTL seconds. Has no effect together with CLIENTSIDE_RANGE.
+BACKGROUND_CALLBACKS = os.environ.get('BACKGROUND_CALLBACKS', '').lower() in ('1', 'true', 'yes')
+BACKGROUND_RESULT_TTL = int(os.environ.get('BACKGROUND_RESULT_TTL', 600))
+if BACKGROUND_CALLBACKS:
+    import diskcache
+
+    background_cache = diskcache.Cache(os.environ.get('BACKGROUND_CACHE_DIR', '.background_cache'))
+    # No Dash result cache (cache_by): it would also keep views with a failed chart. Results are shared and
+    # kept by single_flight in the callback, keyed by the indicator's data version.
+    background_manager = dash.DiskcacheManager(background_cache)
+
+# Indicator catalogs larger than this are searched on the server instead of being sent to the page whole
+DROPDOWN_MAX_OPTIONS = int(os.environ.get('DROPDOWN_MAX_OPTIONS', 100))
+
+# Opt-in query mode: an extra chart driven by a query over every indicator in the data (see query_engine.py),
+# e.g. "prefix:SL.UEM year >= 2000" or "topic:labor AND value > 5". At most QUERY_MAX_SERIES indicators are drawn.
+QUERY_MODE = os.environ.get('QUERY_MODE', '').lower() in ('1', 'true', 'yes')
+QUERY_MAX_SERIES = int(os.environ.get('QUERY_MAX_SERIES', 10))
+if QUERY_MODE:
+    # Build a reloaded snapshot's database on the watcher thread, before a query has to wait for it
+    data_source.on_change(lambda old, new, changed: new.database)
 
 # Choose a Bootstrap theme
 bootstrap_theme_url = dbc.themes.BOOTSTRAP  # or any other theme
@@ -37,6 +104,25 @@ external_stylesheets = [bootstrap_theme_url, custom_stylesheet_url]
 # Initialize the Dash app with Bootstrap
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 
+# Prometheus-style /metrics route and request timing (only when METRICS_ENABLED is set)
+metrics.instrument_server(app.server)
+
+# The background map and logo are served as fingerprinted, precompressed files that browsers cache for
+# a year, rather than being inlined into the layout as base64 on every page load
+static_assets = StaticAssets(app.server, 'assets', url_prefix=app.config.requests_pathname_prefix)
+if COMPACT_FIGURES:
+    app.config.external_scripts.append(static_assets.register(
+        'figure-template.js', b'window.dashboardFigureTemplate = ' + dumps(figure_template) + b';'
+    ))
+
+# Function to put a serialized figure into the format sent to the browser
+def wire_figure(figure):
+    return compact_figure(figure, figure_template) if COMPACT_FIGURES else figure
+
+# Function to build the blank figure shown in place of a chart that failed or has nothing selected
+def empty_figure():
+    return wire_figure(serialize_figure(go.Figure()))
+
 
 # Custom styles for the cards and graph margins
 CARD_STYLE = {
@@ -74,9 +160,6 @@ GRAPH_CARD_STYLE = {
         "marginBottom": "10px",  # Adjust margin as needed
 }
 
-# Define your color palette
-color_palette = ['#3366CC', '#DC3912', '#FF9900', '#109618', '#990099']
-
 # You might want to create an overlay to achieve the glossy effect
 GRAPH_CARD_OVERLAY_STYLE = {
     "position": "absolute",
@@ -94,7 +177,7 @@ navbar = dbc.Navbar(
       html.A(
           dbc.Row(
               [
-                  dbc.Col(html.Img(src=f'data:image/svg+xml;base64,{logo_image}', height="80px"), className="align-self-center"),
+                  dbc.Col(html.Img(src=static_assets.url('logo.svg'), height="80px"), className="align-self-center"),
               ],
               align="center",
               justify="start",  # Use "start", "center", "end", "between" or "around" here to adjust the alignment
@@ -119,33 +202,23 @@ def generate_custom_card(id, title, content):
     # Adding 'animated-border-card' class to the card component
     return dbc.Card(card_body, id=id, className="animated-border-card", style=CUSTOM_CARD_STYLE)
 
-# Function to apply a consistent layout to figures
-def apply_fig_styles(fig):
-    fig.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',  # Making plot background transparent
-        paper_bgcolor='rgba(0,0,0,0)',  # Making paper background transparent
-        font=dict(size=10),  # Adjusting font size
-        margin=dict(l=20, r=20, t=40, b=20)  # Tightening figure margins
-    )
-    return fig
-    
-# Define a function to get the latest value of an indicator
-def get_latest_value(indicator_name):
-    indicator_data = data_unemployment[data_unemployment['Indicator Name'] == indicator_name]
-    # Transpose the data to have years as rows
-    indicator_data = indicator_data.melt(id_vars=['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code'], var_name='Year', value_name='Value')
-    # Convert year to numeric and sort to get the latest year
-    indicator_data['Year'] = pd.to_numeric(indicator_data['Year'], errors='coerce')
-    indicator_data = indicator_data.dropna(subset=['Year'])
-    latest_year_data = indicator_data[indicator_data['Year'] == indicator_data['Year'].max()]
-    if not latest_year_data.empty:
-        latest_value = latest_year_data.iloc[0]['Value']
-        return latest_value, int(latest_year_data.iloc[0]['Year'])
-    return None, None
+# Key indicator cards shown above the graphs: indicator name -> shortened title.
+# Card values are dictionary lookups into the store's latest-value index, so adding a card is free.
+KEY_INDICATORS = {
+    "Unemployment, total (% of total labor force) (national estimate)": "Total Unemployment",
+    "Unemployment, youth total (% of total labor force ages 15-24) (national estimate)": "Youth Unemployment",
+    "Unemployment with advanced education (% of total labor force with advanced education)": "Advanced Education Unemployment",
+    "Unemployment with intermediate education, female (% of female labor force with intermediate education)": "Education Unemployment, Female",
+}
+
+# Define a function to get the latest published (non-null) value of an indicator and its year
+def get_latest_value(indicator_name, snapshot=None):
+    store = (snapshot or data_source.snapshot).store
+    return store.latest_values.get(store.code_for(indicator_name), (None, None))
 
 # Now create a card content generator function
-def card_content(indicator_name, default_title="Key Indicator"):
-    value, year = get_latest_value(indicator_name)
+def card_content(indicator_name, default_title="Key Indicator", snapshot=None):
+    value, year = get_latest_value(indicator_name, snapshot)
     if value is not None:
         return dbc.CardBody([
             html.H5(f"{indicator_name}", className="card-title"),
@@ -158,16 +231,9 @@ def card_content(indicator_name, default_title="Key Indicator"):
         ])
 
 # Function to generate card content with a shortened title
-def card_content_short(indicator_name, default_title="Key Indicator"):
-    value, year = get_latest_value(indicator_name)
-    # Shortened titles
-    short_titles = {
-        "Unemployment, total (% of total labor force) (national estimate)": "Total Unemployment",
-        "Unemployment, youth total (% of total labor force ages 15-24) (national estimate)": "Youth Unemployment",
-        "Unemployment with advanced education (% of total labor force with advanced education)": "Advanced Education Unemployment",
-        "Unemployment with intermediate education, female (% of female labor force with intermediate education)": "Education Unemployment, Female"
-    }
-    short_title = short_titles.get(indicator_name, default_title)
+def card_content_short(indicator_name, default_title="Key Indicator", snapshot=None):
+    value, year = get_latest_value(indicator_name, snapshot)
+    short_title = KEY_INDICATORS.get(indicator_name, default_title)
     
     if value is not None:
         return dbc.CardBody([
@@ -180,305 +246,506 @@ def card_content_short(indicator_name, default_title="Key Indicator"):
             html.P("No data available", className="card-text")
         ])
 
-# Update your key indicators row with the shortened titles
-key_indicators_row = dbc.Row([
-    dbc.Col(dbc.Card(card_content_short("Unemployment, total (% of total labor force) (national estimate)"), style=CARD_STYLE), md=3, lg=3),
-    dbc.Col(dbc.Card(card_content_short("Unemployment, youth total (% of total labor force ages 15-24) (national estimate)"), style=CARD_STYLE), md=3, lg=3),
-    dbc.Col(dbc.Card(card_content_short("Unemployment with advanced education (% of total labor force with advanced education)"), style=CARD_STYLE), md=3, lg=3),
-    dbc.Col(dbc.Card(card_content_short("Unemployment with intermediate education, female (% of female labor force with intermediate education)"), style=CARD_STYLE), md=3, lg=3),
-], className="mb-4")
-
-# Use dbc.Container for overall layout, dbc.Row and dbc.Col for grid
-app.layout = dbc.Container(fluid=True, style={
-    'position': 'relative',
-    'backgroundImage': 'linear-gradient(191.92deg, #000428 8.61%, #757DBE 192.04%)',
-    'minHeight': '100vh',  # Ensure it covers the full viewport height
-    'padding': '1.2em',
-}, children=[
-    # Simulated :before element for the animated background
-    html.Div(style={
-        'display': 'block',
-        'position': 'fixed',
-        'top': '2em',
-        'left': '-100%',
-        'right': '0',
-        'bottom': '0',
-        'backgroundImage': f'url("data:image/svg+xml;base64,{background_image}")',
-        'backgroundRepeat': 'repeat-x',
-        'backgroundPosition': 'center',
-        'backgroundSize': 'auto 85vh',
-        'pointerEvents': 'none',
-        'userSelect': 'none',
-        'animation': 'animatedgradient 32s linear infinite',
-        'backfaceVisibility': 'hidden',
-        'opacity': '0.5',
-    }),
-    navbar,
-    # html.H1("South Korea Unemployment Dashboard",   style={'textAlign': 'center', 'color': 'white', 'fontSize': '28px'}),
-    # Dropdown and slider
-    dbc.Row([
-        dbc.Col([
-            html.Label("Select Unemployment Indicators", style={'marginTop': '1.2rem', 'color': 'white',}),
-            dcc.Dropdown(
-                id='indicator-dropdown',
-                options=[{'label': i, 'value': i} for i in unemployment_indicators],
-                value=unemployment_indicators[0] if unemployment_indicators else None,
-                style={'width': '100%', 'color': 'black', 'marginTop': '.75rem'}
-            ),
-            html.Div([
-                html.Label("Select Year Range", style={'marginBottom': '.5rem', 'marginLeft': '20px', 'color': 'white'}),
-                dcc.RangeSlider(
-                    id='year-range-slider',
-                    min=1980,
-                    max=2022,
-                    step=1,
-                    marks={year: str(year) for year in range(1980, 2023)},
-                    value=[2010, 2022],
-                    allowCross=False
+# Function to build the key indicators row with the shortened titles
+def key_indicators_row(snapshot=None):
+    return dbc.Row([
+        dbc.Col(dbc.Card(card_content_short(indicator_name, snapshot=snapshot), style=CARD_STYLE), md=3, lg=3)
+        for indicator_name in KEY_INDICATORS
+    ], className="mb-4")
+
+# Function to wrap a graph in a card, with a slot for its error message and a store for the view it last rendered
+def graph_card(graph_id, **graph_kwargs):
+    return dbc.Card([
+        dcc.Graph(id=graph_id, **graph_kwargs),
+        html.Div(id=f'{graph_id}-message', className="text-center text-danger mt-2"),
+        dcc.Store(id=f'{graph_id}-view'),
+    ], style=GRAPH_CARD_STYLE)
+
+# Year range the slider starts on: the last dozen years of the snapshot's data
+def default_years(snapshot):
+    min_year, max_year = snapshot.slider_bounds()
+    return [max(min_year, max_year - 12), max_year]
+
+# Use dbc.Container for overall layout, dbc.Row and dbc.Col for grid.
+# The layout is built once per data snapshot and reused for every page load; the dropdown options,
+# slider bounds and cards all come from that snapshot.
+@lru_cache(maxsize=1)
+def snapshot_layout(snapshot):
+    indicators = snapshot.indicators()
+    min_year, max_year = snapshot.slider_bounds()
+    compared = [name for name in KEY_INDICATORS if name in indicators][:3] or indicators[:2]
+    return dbc.Container(fluid=True, style={
+        'position': 'relative',
+        'backgroundImage': 'linear-gradient(191.92deg, #000428 8.61%, #757DBE 192.04%)',
+        'minHeight': '100vh',  # Ensure it covers the full viewport height
+        'padding': '1.2em',
+    }, children=[
+        # Simulated :before element for the animated background
+        html.Div(style={
+            'display': 'block',
+            'position': 'fixed',
+            'top': '2em',
+            'left': '-100%',
+            'right': '0',
+            'bottom': '0',
+            'backgroundImage': f'url("{static_assets.url("world-map.svg")}")',
+            'backgroundRepeat': 'repeat-x',
+            'backgroundPosition': 'center',
+            'backgroundSize': 'auto 85vh',
+            'pointerEvents': 'none',
+            'userSelect': 'none',
+            'animation': 'animatedgradient 32s linear infinite',
+            'backfaceVisibility': 'hidden',
+            'opacity': '0.5',
+        }),
+        navbar,
+        # html.H1("South Korea Unemployment Dashboard",   style={'textAlign': 'center', 'color': 'white', 'fontSize': '28px'}),
+        # Dropdown and slider
+        dbc.Row([
+            dbc.Col([
+                html.Label("Select Unemployment Indicators", style={'marginTop': '1.2rem', 'color': 'white',}),
+                dcc.Dropdown(
+                    id='indicator-dropdown',
+                    # Large catalogs only ship the selected option; the rest are found by searching
+                    options=[{'label': i, 'value': i} for i in indicators[:1 if len(indicators) > DROPDOWN_MAX_OPTIONS else None]],
+                    value=indicators[0] if indicators else None,
+                    searchable=True,
+                    placeholder="Type to search indicators",
+                    style={'width': '100%', 'color': 'black', 'marginTop': '.75rem'}
                 ),
-            ], style={'marginTop': '1rem', 'marginBottom': '.5rem'}),
-        ], width=12),
-    ]),
-    # Cards for key indicators
-    key_indicators_row,
-    # Graphs styled as cards
-    dbc.Row([
-        dbc.Col(dbc.Card(dcc.Graph(id='line-graph'), style=GRAPH_CARD_STYLE), width=4),
-        dbc.Col(dbc.Card(dcc.Graph(id='bar-chart'), style=GRAPH_CARD_STYLE), width=5),
-        dbc.Col(dbc.Card(dcc.Graph(id='scatter-plot', config={'displayModeBar': False}), style=GRAPH_CARD_STYLE), width=3),
-    ], className="mb-4"),
+                html.Label("Compare Indicators", style={'marginTop': '1rem', 'color': 'white'}),
+                dbc.Row([
+                    dbc.Col(dcc.Dropdown(
+                        id='compare-dropdown',
+                        options=[{'label': i, 'value': i} for i in (compared if len(indicators) > DROPDOWN_MAX_OPTIONS else indicators)],
+                        value=compared,
+                        multi=True,
+                        searchable=True,
+                        placeholder="Type to search indicators",
+                        style={'width': '100%', 'color': 'black'}
+                    ), width=9),
+                    dbc.Col(dcc.RadioItems(
+                        id='compare-layout',
+                        options=[{'label': 'Overlay', 'value': 'overlay'}, {'label': 'Small multiples', 'value': 'facets'}],
+                        value='overlay',
+                        inline=True,
+                        inputStyle={'marginRight': '.3rem', 'marginLeft': '1rem'},
+                        style={'color': 'white', 'marginTop': '.4rem'}
+                    ), width=3),
+                ], style={'marginTop': '.5rem'}),
+                html.Div([
+                    html.Label("Select Year Range", style={'marginBottom': '.5rem', 'marginLeft': '20px', 'color': 'white'}),
+                    dcc.RangeSlider(
+                        id='year-range-slider',
+                        min=min_year,
+                        max=max_year,
+                        step=1,
+                        # A mark every five years (the tooltip shows the exact years) keeps the layout small
+                        marks={**{year: str(year) for year in range(min_year, max_year - 2, 5)}, max_year: str(max_year)},
+                        tooltip={'placement': 'bottom'},
+                        value=default_years(snapshot),
+                        # value (read by server callbacks) changes when a handle is released; drag_value follows
+                        # the drag, and drives the clientside range slicing, which is cheap enough to keep up
+                        drag_value=default_years(snapshot),
+                        allowCross=False,
+                        updatemode='mouseup',
+                    ),
+                    # Every chart rendered over the full year range for the selected indicator (clientside mode only)
+                    dcc.Store(id='range-figures'),
+                    # Shown while a view is being rendered (background mode only)
+                    html.Progress(id='view-progress', style={'display': 'none'}),
+                ], style={'marginTop': '1rem', 'marginBottom': '.5rem'}),
+            ], width=12),
+        ]),
+        # Cards for key indicators
+        key_indicators_row(snapshot),
+        # Graphs styled as cards
+        dbc.Row([
+            dbc.Col(graph_card('line-graph'), width=4),
+            dbc.Col(graph_card('bar-chart'), width=5),
+            dbc.Col(graph_card('scatter-plot', config={'displayModeBar': False}), width=3),
+        ], className="mb-4"),
     
-    dbc.Row([
-        dbc.Col(dbc.Card(dcc.Graph(id='heatmap'), style=GRAPH_CARD_STYLE), width=2),
-        dbc.Col(dbc.Card(dcc.Graph(id='pie-chart'), style=GRAPH_CARD_STYLE), width=5),
-        dbc.Col(dbc.Card(dcc.Graph(id='line-fig-variability'), style=GRAPH_CARD_STYLE), width=5),
-    ], className="mb-4"),
-
-    dbc.Row([
-        dbc.Col(dbc.Card(dcc.Graph(id='area-plot'), style=GRAPH_CARD_STYLE), width=5),
-        dbc.Col(dbc.Card(dcc.Graph(id='bubble-chart'), style=GRAPH_CARD_STYLE), width=4),
-        dbc.Col(dbc.Card(dcc.Graph(id='histogram'), style=GRAPH_CARD_STYLE), width=3),
-    ], className="mb-4"),
-   
-    html.Div(id='graph-message', className="text-center text-danger mt-2")
-])
-
-# Callback for updating graphs based on selected indicator and year
+        dbc.Row([
+            dbc.Col(graph_card('heatmap'), width=2),
+            dbc.Col(graph_card('pie-chart'), width=5),
+            dbc.Col(graph_card('line-fig-variability'), width=5),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(graph_card('area-plot'), width=5),
+            dbc.Col(graph_card('bubble-chart'), width=4),
+            dbc.Col(graph_card('histogram'), width=3),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(graph_card('volatility-chart'), width=6),
+            dbc.Col(graph_card('trend-chart'), width=6),
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col(graph_card('compare-line'), width=4),
+            dbc.Col(graph_card('compare-area'), width=4),
+            dbc.Col(graph_card('compare-bar'), width=4),
+        ], className="mb-4"),
+
+        *([dbc.Row([
+            dbc.Col([
+                html.Label("Query Indicators", style={'color': 'white'}),
+                dcc.Input(
+                    id='indicator-query',
+                    type='text',
+                    debounce=True,
+                    placeholder="e.g. prefix:SL.UEM  topic:labor  keyword:youth  year >= 2000 AND value > 5",
+                    style={'width': '100%', 'marginBottom': '.75rem'},
+                ),
+                graph_card('query-chart'),
+            ], width=12),
+        ], className="mb-4")] if QUERY_MODE else []),
+    ])
+
+def serve_layout():
+    return snapshot_layout(data_source.snapshot)
+
+app.layout = serve_layout
+
+# The layout as JSON, serialized and compressed once per data snapshot
+@lru_cache(maxsize=1)
+def layout_payload(snapshot):
+    return CompressedPayload(to_json_plotly(snapshot_layout(snapshot)).encode('utf-8'), 'application/json')
+
+# Serve /_dash-layout from that payload instead of re-serializing the component tree on every page load.
+# The ETag lets browsers revalidate with a 304 until the data changes.
+def serve_layout_json():
+    return layout_payload(data_source.snapshot).response(request, 'no-cache')
+
+app.server.view_functions[f'{app.config.routes_pathname_prefix}_dash-layout'] = serve_layout_json
+
+# Search the indicator catalog on the server when it's too large to send to the page whole.
+# Selected indicators stay in the options so the dropdown keeps showing them.
+def register_indicator_search(dropdown_id):
+    @app.callback(
+        Output(dropdown_id, 'options'),
+        [Input(dropdown_id, 'search_value')],
+        [State(dropdown_id, 'value')]
+    )
+    def search_indicators(search_value, selected):
+        indicators = data_source.snapshot.indicators()
+        if len(indicators) <= DROPDOWN_MAX_OPTIONS or not search_value:
+            return dash.no_update
+        matches = [name for name in indicators if search_value.lower() in name.lower()][:DROPDOWN_MAX_OPTIONS]
+        selected = selected if isinstance(selected, list) else [selected]
+        matches = [name for name in selected if name in indicators and name not in matches] + matches
+        return [{'label': name, 'value': name} for name in matches]
+
+    return search_indicators
+
+register_indicator_search('indicator-dropdown')
+register_indicator_search('compare-dropdown')
+
+# Function to build (or fetch from cache) one chart for the selected indicator and year range.
+# Each stage is timed when METRICS_ENABLED is set (see metrics.py and the /metrics route).
+def build_chart(graph_id, selected_indicator, selected_years, snapshot=None):
+    snapshot = snapshot or data_source.snapshot
+    builder, source = CHART_BUILDERS[graph_id]
+    start_year, end_year = selected_years
+    cache_key = (graph_id, selected_indicator, start_year, end_year, snapshot.indicator_version(selected_indicator))
+
+    figure = figure_cache.get(cache_key)
+    if figure is not None:
+        metrics.inc('dashboard_figure_cache_total', chart=graph_id, result='hit')
+        metrics.inc('dashboard_payload_bytes_total', figure_cache.size_of(cache_key), chart=graph_id)
+        return figure
+
+    if static_export is not None:
+        figure = static_export.figure(
+            graph_id, snapshot.store.code_for(selected_indicator), cache_key[-1], start_year, end_year
+        )
+        if figure is not None:
+            metrics.inc('dashboard_figure_cache_total', chart=graph_id, result='export')
+            figure = wire_figure(figure)
+            metrics.inc('dashboard_payload_bytes_total', figure_cache.put(cache_key, figure), chart=graph_id)
+            return figure
+
+    metrics.inc('dashboard_figure_cache_total', chart=graph_id, result='miss')
+    with metrics.span('slice', chart=graph_id):
+        plot_data = snapshot.chart_data(source, selected_indicator, start_year, end_year)
+    with metrics.span('build', chart=graph_id):
+        fig = builder(plot_data, selected_indicator, [start_year, end_year])
+    with metrics.span('serialize', chart=graph_id):
+        figure = wire_figure(serialize_figure(fig))
+        size = figure_cache.put(cache_key, figure)
+    metrics.inc('dashboard_payload_bytes_total', size, chart=graph_id)
+    return figure
+
+# Function to build every figure for the selected indicator and year range
+def build_figures(selected_indicator, selected_years, snapshot=None):
+    snapshot = snapshot or data_source.snapshot
+    return [build_chart(graph_id, selected_indicator, selected_years, snapshot) for graph_id in CHART_BUILDERS]
+
+# Function to build one chart's (figure, style, error message) outputs; on error the graph is hidden
+# and the message shown in its place
+def chart_outputs(graph_id, selected_indicator, selected_years, snapshot):
+    try:
+        return build_chart(graph_id, selected_indicator, selected_years, snapshot), {'display': 'block'}, None
+    except Exception as e:
+        metrics.inc('dashboard_callback_errors_total', chart=graph_id)
+        error_message = html.P(f"An error occurred: {str(e)}", className="alert alert-danger")
+        return empty_figure(), {'display': 'none'}, error_message
+
+# Register one callback per chart. Each returns dash.no_update when the view it last rendered
+# (including the version of the indicator's data) hasn't changed, and shows or hides itself on error.
+def register_chart_callback(graph_id):
+    @app.callback(
+        [
+            Output(graph_id, 'figure'),
+            Output(graph_id, 'style'),
+            Output(f'{graph_id}-message', 'children'),
+            Output(f'{graph_id}-view', 'data'),
+        ],
+        [
+            Input('indicator-dropdown', 'value'),
+            Input('year-range-slider', 'value')
+        ],
+        [State(f'{graph_id}-view', 'data')]
+    )
+    def update_chart(selected_indicator, selected_years, rendered_view):
+        snapshot = data_source.snapshot
+        view = [selected_indicator, selected_years, snapshot.indicator_version(selected_indicator)]
+        if view == rendered_view:
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+        figure, style, message = chart_outputs(graph_id, selected_indicator, selected_years, snapshot)
+        return figure, style, message, view if message is None else None
+
+    return update_chart
+
+# Register one background callback rendering every chart of a view in a job process, reporting progress.
+# Concurrent requests for the same (indicator, range, data version) share a single computation, and
+# Dash kills the running job when the same page fires the callback again (e.g. the slider moves on).
+def register_background_callback():
+    @app.callback(
+        [Output(graph_id, 'figure') for graph_id in CHART_BUILDERS]
+        + [Output(graph_id, 'style') for graph_id in CHART_BUILDERS]
+        + [Output(f'{graph_id}-message', 'children') for graph_id in CHART_BUILDERS],
+        [
+            Input('indicator-dropdown', 'value'),
+            Input('year-range-slider', 'value')
+        ],
+        background=True,
+        manager=background_manager,
+        progress=[Output('view-progress', 'value'), Output('view-progress', 'max')],
+        running=[(Output('view-progress', 'style'), {'display': 'block', 'width': '100%'}, {'display': 'none'})],
+    )
+    def update_view(set_progress, selected_indicator, selected_years):
+        snapshot = data_source.snapshot
+        start_year, end_year = selected_years
+
+        def render():
+            rendered = []
+            for i, graph_id in enumerate(CHART_BUILDERS):
+                figure, style, message = chart_outputs(graph_id, selected_indicator, selected_years, snapshot)
+                rendered.append((figure, style, None if message is None else message.children))
+                set_progress((i + 1, len(CHART_BUILDERS)))
+            return rendered
+
+        key = (selected_indicator, start_year, end_year, snapshot.indicator_version(selected_indicator))
+        # A view with a failed chart isn't shared or kept, so a transient failure is retried on the next request
+        rendered = single_flight(
+            background_cache, key, render, expire=BACKGROUND_RESULT_TTL,
+            cacheable=lambda charts: all(message is None for _, _, message in charts),
+        )
+        figures, styles, messages = zip(*rendered)
+        messages = [None if text is None else html.P(text, className="alert alert-danger") for text in messages]
+        return list(figures) + list(styles) + messages
+
+    return update_view
+
+# Function to build the comparison charts for several indicators. Each indicator's trace is cached per chart,
+# year range and data version, so changing the selection only slices and builds the newly added indicators,
+# all of them in one batched lookup.
+def build_compare_figures(selected_indicators, layout_mode, selected_years, snapshot=None):
+    snapshot = snapshot or data_source.snapshot
+    start_year, end_year = selected_years
+    selected_indicators = [name for name in dict.fromkeys(selected_indicators) if snapshot.store.code_for(name)]
+    trace_keys = {
+        (graph_id, name): (f'{graph_id}-trace', name, start_year, end_year, snapshot.indicator_version(name))
+        for graph_id in COMPARE_CHARTS for name in selected_indicators
+    }
+    traces = {view: figure_cache.get(key) for view, key in trace_keys.items()}
+    missing = list(dict.fromkeys(name for (_, name), trace in traces.items() if trace is None))
+    for graph_id in COMPARE_CHARTS:
+        metrics.inc('dashboard_figure_cache_total', len(selected_indicators) - len(missing), chart=graph_id, result='hit')
+        metrics.inc('dashboard_figure_cache_total', len(missing), chart=graph_id, result='miss')
+
+    if missing:
+        with metrics.span('slice', chart='compare'):
+            plot_data = snapshot.store.slice_many([snapshot.store.code_for(name) for name in missing], start_year, end_year)
+            rows = dict(tuple(plot_data.groupby('Indicator Code', sort=False)))
+        for graph_id, kind in COMPARE_CHARTS.items():
+            with metrics.span('build', chart=graph_id):
+                for name in missing:
+                    trace = build_indicator_trace(kind, rows.get(snapshot.store.code_for(name), plot_data.iloc[0:0]), name)
+                    figure_cache.put(trace_keys[(graph_id, name)], trace)
+                    traces[(graph_id, name)] = trace
+
+    return [
+        wire_figure(compose_compare_figure(
+            kind, [traces[(graph_id, name)] for name in selected_indicators], selected_indicators, layout_mode, selected_years
+        ))
+        for graph_id, kind in COMPARE_CHARTS.items()
+    ]
+
+# The comparison charts share one callback, so a selection change costs a single batched slice
 @app.callback(
+    [Output(graph_id, 'figure') for graph_id in COMPARE_CHARTS]
+    + [Output(graph_id, 'style') for graph_id in COMPARE_CHARTS]
+    + [Output(f'{graph_id}-message', 'children') for graph_id in COMPARE_CHARTS],
     [
-        Output('line-graph', 'figure'),
-        Output('bar-chart', 'figure'),
-        Output('scatter-plot', 'figure'),
-        Output('pie-chart', 'figure'),
-        Output('line-fig-variability', 'figure'),
-        Output('histogram', 'figure'),
-        Output('area-plot', 'figure'),
-        Output('heatmap', 'figure'),
-        Output('bubble-chart', 'figure'),
-        Output('graph-message', 'children'),
-    ],
-    [
-        Input('indicator-dropdown', 'value'),
+        Input('compare-dropdown', 'value'),
+        Input('compare-layout', 'value'),
         Input('year-range-slider', 'value')
     ]
 )
-
-def update_graphs(selected_indicator, selected_years):
+def update_compare_charts(selected_indicators, layout_mode, selected_years):
+    count = len(COMPARE_CHARTS)
+    if not selected_indicators:
+        return [empty_figure()] * count + [{'display': 'none'}] * count + [None] * count
     try:
-        filtered_data = data_unemployment[data_unemployment['Indicator Name'] == selected_indicator]
-        
-        # Extract the years column based on the selected range
-        years_column = [str(year) for year in range(selected_years[0], selected_years[1] + 1)]
-        
-        # Prepare data for plotting
-        plot_data = pd.melt(filtered_data, id_vars=['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code'], value_vars=years_column, var_name='Year', value_name='Value')
-
-        # Filter data for South Korea and global or regional unemployment rate
-        south_korea_data = data_unemployment[data_unemployment['Country Name'] == 'South Korea']
-        global_or_regional_data = data_unemployment[data_unemployment['Country Name'] != 'South Korea']
-
-        # Reshape the data for the line graph
-        years_column = [str(year) for year in range(selected_years[0], selected_years[1] + 1)]
-        sk_plot_data = pd.melt(south_korea_data, id_vars=['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code'], 
-                               value_vars=years_column, var_name='Year', value_name='Value')
-        global_or_regional_plot_data = pd.melt(global_or_regional_data, id_vars=['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code'], 
-                                                value_vars=years_column, var_name='Year', value_name='Value')
-
-        # Combine data for South Korea and global or regional unemployment rate
-        combined_data = pd.concat([sk_plot_data, global_or_regional_plot_data])
-
-        # Generate line graph for national trends comparison
-        line_fig = px.line(
-            combined_data, 
-            x='Year', 
-            y='Value', 
-            title='Comparison with National Trends',
-            labels={'Value': 'Unemployment Rate (%)', 'Year': 'Year'},
-            color_discrete_sequence=['#757DBE']
-        )
-
-        # Apply consistent layout styles
-        line_fig.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',  # Making plot background transparent
-            paper_bgcolor='rgba(0,0,0,0)',  # Making paper background transparent
-            font=dict(size=10),  # Adjusting font size
-            margin=dict(l=20, r=20, t=40, b=20)  # Tightening figure margins
-        )
-        line_fig = apply_fig_styles(line_fig)
-
-        # Bar Chart for comparing unemployment indicators in the selected year
-        bar_fig = go.Figure()
-        if not plot_data.empty:
-          bar_fig = px.bar(
-              plot_data,
-              x='Year',
-              y='Value',
-              title=f'Unemployment Indicators from {selected_years[0]} to {selected_years[1]}',
-              color_discrete_sequence=['#318F95']
-          )
-          bar_fig = apply_fig_styles(bar_fig)
-        else:
-            bar_fig.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper")
-        
-        plot_data = plot_data.dropna(subset=['Value'])
-
-        # Scatter Plot comparing two unemployment indicators (assuming at least two are available)
-        scatter_fig = go.Figure()
-
-        if not plot_data.empty:
-          scatter_fig = px.scatter(
-              plot_data,
-              x='Year',
-              y='Value',
-              size='Value',  # Adjusting the size of data points based on the value
-              title='Comparison of Unemployment Trends Over Time',
-              color_discrete_sequence=['#E64E44'],  # Using a continuous color scale
-              labels={'Value': 'Unemployment Rate (%)'},  # Label for the size axis
-              size_max=20,  # Maximum size of data points
-          )
-          scatter_fig = apply_fig_styles(scatter_fig)
-        else:
-            scatter_fig.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper")
-        
-        # Pie Chart for the distribution of unemployment indicators in the selected year
-        pie_fig = go.Figure()
-        if not plot_data.empty:
-            pie_fig = px.pie(
-                plot_data,
-                values='Value',
-                names='Year',
-                title=f'Distribution of Unemployment Indicators from {selected_years[0]} to {selected_years[1]}',
-                labels={'Value': 'Unemployment Rate (%)'}  # Label for the value axis
-            )
-            pie_fig.update_traces(hoverinfo='label+percent', textinfo='percent+label', textfont_size=14)
-            pie_fig.update_layout(scene=dict(aspectmode="cube"))
-            pie_fig = apply_fig_styles(pie_fig)       
-        else:
-            pie_fig.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper") 
-
-       # Line Chart showing variability of the selected indicator over years
-        line_fig_variability = go.Figure()
-        if not plot_data.empty:
-            line_fig_variability = px.line(
-                plot_data,
-                x='Year',
-                y='Value',
-                title=f'Variability of {selected_indicator}',
-                color_discrete_sequence=['#8B5A37']
-            )
-            line_fig_variability = apply_fig_styles(line_fig_variability)  
-        else:
-            line_fig_variability.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper")
-
-
-        # Histogram showing the distribution of values for the selected indicator
-        hist_fig = go.Figure()
-        if not plot_data.empty:
-            hist_fig = px.histogram(
-                plot_data,
-                x='Value',
-                title=f'Distribution of {selected_indicator}',
-                color_discrete_sequence=color_palette
-            )
-            hist_fig = apply_fig_styles(hist_fig)    
-        else:
-          hist_fig.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper")  
-
-        # Area Plot
-        area_fig = go.Figure()
-        if not plot_data.empty:
-            area_fig = px.area(
-                plot_data,
-                x='Year',
-                y='Value',
-                title=f'Area Plot of {selected_indicator}',
-                color_discrete_sequence=['#694BAF']
-            )
-            area_fig = apply_fig_styles(area_fig)  
-        else:    
-          area_fig.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper")  
-  
-        # Heatmap
-        heatmap_fig = go.Figure()
-        if not plot_data.empty:
-            heatmap_fig = px.imshow(
-                plot_data.pivot_table(index='Year', columns='Country Name', values='Value'),
-                title='Unemployment by Country and Year'
-                # No color_discrete_sequence as this is not a parameter for imshow
-            )  
-            heatmap_fig = apply_fig_styles(heatmap_fig)
-        else:    
-          heatmap_fig.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper")      
-        
-        # Bubble Chart
-        bubble_fig = go.Figure()
-        if not plot_data.empty:
-            bubble_fig = px.scatter(
-                plot_data,
-                x='Year',
-                y='Value',
-                size='Value',
-                color='Year',
-                title='Unemployment Over Time',
-                color_discrete_sequence=color_palette
-            ) 
-            bubble_fig = apply_fig_styles(bubble_fig)   
-        else:    
-          bubble_fig.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper")
-
-
-        return line_fig, bar_fig, scatter_fig, pie_fig, line_fig_variability, hist_fig, area_fig, heatmap_fig, bubble_fig, None  # Return None for message div if no error occurs
-    
+        figures = build_compare_figures(selected_indicators, layout_mode, selected_years)
+        return figures + [{'display': 'block'}] * count + [None] * count
     except Exception as e:
-        # If an error occurs, display an error message
-        error_message = html.Div([
-            html.P(f"An error occurred: {str(e)}", className="alert alert-danger")
-        ])
-        return (
-            go.Figure(),
-            go.Figure(),
-            go.Figure(),
-            go.Figure(),
-            go.Figure(),
-            go.Figure(),
-            go.Figure(),
-            go.Figure(),
-            go.Figure(),
-            error_message,
+        metrics.inc('dashboard_callback_errors_total', chart='compare')
+        error_message = html.P(f"An error occurred: {str(e)}", className="alert alert-danger")
+        return [empty_figure()] * count + [{'display': 'none'}] * count + [error_message] * count
+
+# Function to build (or fetch from cache) the query chart. Filtering and averaging happen in the
+# snapshot's database; figures are cached per snapshot as a query can match any indicator.
+def build_query_chart(query, selected_years, snapshot=None):
+    snapshot = snapshot or data_source.snapshot
+    start_year, end_year = selected_years
+    cache_key = ('query-chart', query, start_year, end_year, snapshot.version)
+
+    figure = figure_cache.get(cache_key)
+    if figure is not None:
+        metrics.inc('dashboard_figure_cache_total', chart='query-chart', result='hit')
+        return figure
+
+    metrics.inc('dashboard_figure_cache_total', chart='query-chart', result='miss')
+    with metrics.span('slice', chart='query-chart'):
+        plot_data = snapshot.database.query(
+            query, snapshot.comparison_country, start_year, end_year, max_series=QUERY_MAX_SERIES
         )
-
-# Callback to control the visibility of the graph plots based on whether an error message is displayed
-@app.callback(
-    [Output(component_id, 'style') for component_id in ['line-graph', 'bar-chart', 'scatter-plot', 'pie-chart', 'line-fig-variability', 'histogram', 'area-plot', 'heatmap', 'bubble-chart']],
-    [Input('graph-message', 'children')]
-)
-def hide_graphs(error_message):
-    if error_message:
-        # If an error message is displayed, hide all graph plots
-        return [{'display': 'none'}] * 9
-    else:
-        # If no error message, show all graph plots
-        return [{'display': 'block'}] * 9
-
+    with metrics.span('build', chart='query-chart'):
+        fig = build_query_figure(plot_data, query, [start_year, end_year])
+    with metrics.span('serialize', chart='query-chart'):
+        figure = wire_figure(serialize_figure(fig))
+        figure_cache.put(cache_key, figure)
+    return figure
+
+if QUERY_MODE:
+    # Query errors (unknown columns, bad syntax) are shown under the input; the chart stays as it was
+    @app.callback(
+        [
+            Output('query-chart', 'figure'),
+            Output('query-chart', 'style'),
+            Output('query-chart-message', 'children'),
+        ],
+        [
+            Input('indicator-query', 'value'),
+            Input('year-range-slider', 'value')
+        ]
+    )
+    def update_query_chart(query, selected_years):
+        if not query:
+            return empty_figure(), {'display': 'none'}, None
+        try:
+            return build_query_chart(query, selected_years), {'display': 'block'}, None
+        except QueryError as e:
+            return dash.no_update, dash.no_update, html.P(str(e), className="alert alert-warning")
+        except Exception as e:
+            metrics.inc('dashboard_callback_errors_total', chart='query-chart')
+            error_message = html.P(f"An error occurred: {str(e)}", className="alert alert-danger")
+            return empty_figure(), {'display': 'none'}, error_message
+
+if CLIENTSIDE_RANGE:
+    # Ship every chart that can be sliced over the full year range, plus the raw series, once per indicator change
+    @app.callback(Output('range-figures', 'data'), [Input('indicator-dropdown', 'value')])
+    def update_range_figures(selected_indicator):
+        snapshot = data_source.snapshot
+        full_range = [snapshot.store.min_year, snapshot.store.max_year]
+        try:
+            return {
+                'figures': {
+                    graph_id: build_chart(graph_id, selected_indicator, full_range, snapshot)
+                    for graph_id in CHART_BUILDERS if graph_id not in RANGE_FITTED_CHARTS
+                },
+                'series': snapshot.store.series(snapshot.store.code_for(selected_indicator)),
+            }
+        except Exception as e:
+            metrics.inc('dashboard_callback_errors_total', chart='range-figures')
+            return {'error': str(e)}
+
+    # Year range changes re-slice those figures in the browser as the slider is dragged (see assets/clientside.js)
+    for graph_id in CHART_BUILDERS:
+        if graph_id in RANGE_FITTED_CHARTS:
+            # Refitted on the server once the slider is released, not at every step of a drag
+            register_chart_callback(graph_id)
+            continue
+        app.clientside_callback(
+            ClientsideFunction(namespace='range', function_name='slice_figure'),
+            [
+                Output(graph_id, 'figure'),
+                Output(graph_id, 'style'),
+                Output(f'{graph_id}-message', 'children'),
+            ],
+            [Input('range-figures', 'data'), Input('year-range-slider', 'drag_value')],
+            [State(graph_id, 'id')]
+        )
+elif BACKGROUND_CALLBACKS:
+    register_background_callback()
+else:
+    for graph_id in CHART_BUILDERS:
+        register_chart_callback(graph_id)
+
+# Set once warm_up has run; /readyz reports ready only after that
+warmed_up = threading.Event()
+
+# Function to prerender views ((indicator, [start, end]) pairs, most requested first) into the figure cache,
+# along with the layout, the snapshot's derived metrics and (in query mode) its query database, before taking
+# traffic. Without views, every indicator's default view (what a page load asks for) is prerendered.
+# At most limit views are rendered, and never more than the figure cache holds, since rendering more would
+# evict the first ones. They are rendered least requested first, so the most requested are the most recently
+# used entries and the last to be evicted. Returns how many views were rendered.
+def warm_up(views=None, limit=None):
+    snapshot = data_source.snapshot
+    layout_payload(snapshot)
+    snapshot.analytics.rolling()
+    if QUERY_MODE:
+        snapshot.database
+    if views is None:
+        views = [(name, default_years(snapshot)) for name in snapshot.indicators()]
+    capacity = figure_cache.max_entries // len(CHART_BUILDERS)
+    views = [view for view in views if snapshot.store.code_for(view[0]) is not None]
+    views = views[:capacity if limit is None else min(limit, capacity)]
+    for selected_indicator, selected_years in reversed(views):
+        for graph_id in CHART_BUILDERS:
+            chart_outputs(graph_id, selected_indicator, list(selected_years), snapshot)
+    warmed_up.set()
+    return len(views)
+
+# Liveness: the process is up and serving requests
+@app.server.route('/healthz')
+def healthz():
+    return jsonify(status='ok', pid=os.getpid())
+
+# Readiness: data is loaded and warm_up has run, so requests won't pay for cold caches
+@app.server.route('/readyz')
+def readyz():
+    ready = warmed_up.is_set()
+    body = jsonify(status='ready' if ready else 'warming up', data_version=data_source.snapshot.version)
+    return body, 200 if ready else 503
+
+# Development server; use serve.py in production
 if __name__ == '__main__':
+    warm_up(limit=0)
     app.run_server(debug=True)
@@ -0,0 +1,227 @@
+"""Prerender dashboard views (indicator x year range) to static, gzipped figure JSON.
+
+    python export.py                                   # every indicator x every slider range
+    python export.py --ranges 2010-2022 1980-2022      # a subset of ranges
+    python export.py --indicators SL.UEM.TOTL.NE.ZS --html --png
+
+Each view is written to OUT/<indicator code>/<start>-<end>.json.gz as {graph id: figure}, with
+OUT/manifest.json recording the data version each view was rendered from. Re-running only
+re-renders the views whose indicator's data (or the figure settings or code) changed. Point
+STATIC_EXPORT_DIR at OUT to have the dashboard serve these figures instead of building them.
+"""
+import argparse
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+import plotly.io as pio
+
+from data_source import DataSource
+from figure_cache import serialize_figure
+from figures import CHART_BUILDERS, figure_fingerprint
+
+# Bump when the layout of the export directory changes so old exports are re-rendered
+EXPORT_FORMAT_VERSION = 2
+
+# Data source of a worker process, set up once by init_worker
+worker_source = None
+
+
+# Function to fingerprint everything besides the data that changes an export: its format, the figure
+# settings and the figure code (see figures.figure_fingerprint)
+def export_config():
+    settings = {'format': EXPORT_FORMAT_VERSION, 'figures': figure_fingerprint()}
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+# Key of a year range in the manifest
+def range_key(start_year, end_year):
+    return f'{start_year}-{end_year}'
+
+
+def view_path(out_dir, indicator_code, start_year, end_year, extension='json.gz'):
+    return os.path.join(out_dir, indicator_code, f'{start_year}-{end_year}.{extension}')
+
+
+# Function to render every chart of one view from a snapshot, as {graph id: serialized figure}
+def render_view(snapshot, indicator_name, start_year, end_year):
+    figures = {}
+    for graph_id, (builder, source) in CHART_BUILDERS.items():
+        plot_data = snapshot.chart_data(source, indicator_name, start_year, end_year)
+        figures[graph_id] = serialize_figure(builder(plot_data, indicator_name, [start_year, end_year]))
+    return figures
+
+
+# Write to a temporary file and rename, so a server or CDN sync never sees a half-written file
+def write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def init_worker():
+    global worker_source
+    worker_source = DataSource.from_env()
+
+
+# Function (run in a worker) to render and write a batch of views of one indicator
+def export_views(out_dir, indicator_name, ranges, html=False, png=False):
+    snapshot = worker_source.snapshot
+    indicator_code = snapshot.store.code_for(indicator_name)
+    for start_year, end_year in ranges:
+        figures = render_view(snapshot, indicator_name, start_year, end_year)
+        text = json.dumps(figures, separators=(',', ':')).encode('utf-8')
+        # mtime=0 keeps the output byte-identical across runs, so unchanged views don't look new to a CDN sync
+        write_atomic(view_path(out_dir, indicator_code, start_year, end_year), gzip.compress(text, mtime=0))
+        if html:
+            body = ''.join(pio.to_html(figure, include_plotlyjs='cdn', full_html=False) for figure in figures.values())
+            page = f'<html><head><meta charset="utf-8"><title>{indicator_name}, {start_year}-{end_year}</title></head><body>{body}</body></html>'
+            write_atomic(view_path(out_dir, indicator_code, start_year, end_year, 'html'), page.encode('utf-8'))
+        if png:
+            for graph_id, figure in figures.items():
+                image = pio.to_image(figure, format='png')
+                write_atomic(os.path.join(out_dir, indicator_code, f'{start_year}-{end_year}', f'{graph_id}.png'), image)
+    return indicator_name, ranges
+
+
+def read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(out_dir, manifest):
+    write_atomic(os.path.join(out_dir, 'manifest.json'), json.dumps(manifest, indent=1).encode('utf-8'))
+
+
+# Function to work out which views need rendering: indicator name -> [(start, end), ...]
+def stale_views(out_dir, snapshot, indicators, ranges, manifest, force=False):
+    same_config = manifest.get('config') == export_config()
+    stale = {}
+    for indicator_name in indicators:
+        indicator_code = snapshot.store.code_for(indicator_name)
+        versions = manifest.get('views', {}).get(indicator_code, {}).get('ranges', {})
+        version = snapshot.indicator_version(indicator_name)
+        todo = [
+            (start_year, end_year) for start_year, end_year in ranges
+            if force or not same_config or versions.get(range_key(start_year, end_year)) != version
+            or not os.path.exists(view_path(out_dir, indicator_code, start_year, end_year))
+        ]
+        if todo:
+            stale[indicator_name] = todo
+    return stale
+
+
+# Function to split a list into chunks of at most size items
+def chunked(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def parse_range(text):
+    start_year, end_year = (int(year) for year in text.split('-'))
+    return start_year, end_year
+
+
+# Reader for an export directory, used by the dashboard to serve prerendered figures. A figure is only
+# returned when the export was rendered from the same data version and settings as the live snapshot.
+class StaticExport:
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.config = export_config()
+        self._manifest = {}
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+        self._view = lru_cache(maxsize=32)(self._read_view)
+
+    def figure(self, graph_id, indicator_code, version, start_year, end_year):
+        entry = self._current_manifest().get('views', {}).get(indicator_code, {})
+        if entry.get('ranges', {}).get(range_key(start_year, end_year)) != version:
+            return None
+        view = self._view(indicator_code, start_year, end_year)
+        return view.get(graph_id) if view else None
+
+    # Re-read the manifest when a new export is written
+    def _current_manifest(self):
+        try:
+            mtime = os.stat(os.path.join(self.out_dir, 'manifest.json')).st_mtime_ns
+        except OSError:
+            return {}
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                manifest = read_manifest(self.out_dir)
+                self._manifest = manifest if manifest.get('config') == self.config else {}
+                self._manifest_mtime = mtime
+                self._view.cache_clear()
+            return self._manifest
+
+    def _read_view(self, indicator_code, start_year, end_year):
+        try:
+            with gzip.open(view_path(self.out_dir, indicator_code, start_year, end_year), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default=os.environ.get('STATIC_EXPORT_DIR', 'static_export'),
+                        help='output directory (default $STATIC_EXPORT_DIR or static_export)')
+    parser.add_argument('--indicators', nargs='+', help='indicator codes or names to export (default: all)')
+    parser.add_argument('--ranges', nargs='+', type=parse_range, metavar='START-END',
+                        help='year ranges to export (default: every range the slider allows)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: one per CPU)')
+    parser.add_argument('--batch', type=int, default=50, help='views per worker task (default 50)')
+    parser.add_argument('--html', action='store_true', help='also write a static HTML page per view')
+    parser.add_argument('--png', action='store_true', help='also write a PNG per chart (needs kaleido)')
+    parser.add_argument('--force', action='store_true', help='re-render every view, even if unchanged')
+    args = parser.parse_args()
+    if args.png and importlib.util.find_spec('kaleido') is None:
+        parser.error('--png needs the kaleido package (pip install kaleido)')
+
+    snapshot = DataSource.from_env().snapshot
+    indicators = snapshot.indicators()
+    if args.indicators:
+        wanted = set(args.indicators)
+        indicators = [name for name in indicators if name in wanted or snapshot.store.code_for(name) in wanted]
+    min_year, max_year = snapshot.slider_bounds()
+    ranges = args.ranges or [(start, end) for start in range(min_year, max_year + 1) for end in range(start, max_year + 1)]
+
+    manifest = read_manifest(args.out)
+    stale = stale_views(args.out, snapshot, indicators, ranges, manifest, args.force)
+    total = sum(len(todo) for todo in stale.values())
+    print(f"{total} of {len(indicators) * len(ranges)} views to render with {args.workers} workers")
+
+    if manifest.get('config') != export_config():
+        manifest = {'config': export_config(), 'views': {}}
+    manifest.setdefault('views', {})
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        futures = [
+            pool.submit(export_views, args.out, indicator_name, batch, args.html, args.png)
+            for indicator_name, todo in stale.items()
+            for batch in chunked(todo, args.batch)
+        ]
+        for future in as_completed(futures):
+            indicator_name, done = future.result()
+            # Versions are recorded per view as each batch is written, so views of other ranges rendered
+            # from older data are never taken for current, and an interrupted export picks up where it left off
+            entry = manifest['views'].setdefault(snapshot.store.code_for(indicator_name), {'name': indicator_name})
+            version = snapshot.indicator_version(indicator_name)
+            entry.setdefault('ranges', {}).update((range_key(*view_range), version) for view_range in done)
+            write_manifest(args.out, manifest)
+    elapsed = time.perf_counter() - started
+    print(f"Rendered {total} views in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} views/s) to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
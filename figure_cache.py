@@ -0,0 +1,182 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+from wire_format import dumps, loads
+
+
+# Function to turn a Plotly figure into plain JSON-ready data (what Dash sends to the browser)
+def serialize_figure(fig):
+    if isinstance(fig, dict):
+        return fig
+    return loads(pio.to_json(fig, validate=False))
+
+
+# Bounded, thread-safe LRU cache of serialized figure payloads with an optional on-disk tier.
+# The disk tier is bounded by max_disk_bytes too: least recently used files (by mtime, which reads refresh)
+# are pruned, so files of data versions no longer served age out. Disk entries are also keyed by fingerprint
+# (e.g. of the figure code and settings), so files written by an older deploy are never read back.
+class FigureCache:
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, disk_dir=None, namespace='',
+                 max_disk_bytes=512 * 1024 * 1024, fingerprint=''):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = os.path.join(disk_dir, namespace) if disk_dir and namespace else disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (payload, size in bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_written = 0  # bytes this process wrote to disk since it last measured the directory
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._prune_disk()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    # Return the cached payload for key, or None if it isn't cached in memory or on disk
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        text = self._read_disk(key)
+        if text is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        payload = loads(text)
+        with self._lock:
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(key, payload, len(text))
+        return payload
+
+    # Cache a payload (any JSON-ready value, e.g. a list of serialized figures) under key; returns its size in bytes
+    def put(self, key, payload):
+        text = dumps(payload)
+        with self._lock:
+            self._store(key, payload, len(text))
+        self._write_disk(key, text)
+        return len(text)
+
+    # Size in bytes of the cached payload for key (0 if it isn't in memory)
+    def size_of(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None else 0
+
+    # Drop every in-memory entry whose key matches predicate; returns how many were dropped.
+    # Disk entries are left alone, they are only ever read back under their exact key.
+    def invalidate(self, predicate):
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[1]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    # Insert into the in-memory tier and evict least recently used entries until within bounds (lock must be held)
+    def _store(self, key, payload, size):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (payload, size)
+        self._bytes += size
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr((self.fingerprint, key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f'{digest}.json')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                text = f.read()
+            os.utime(path)  # Mark it recently used, so pruning keeps it
+            return text
+        except OSError:
+            return None
+
+    # Write atomically so a worker never reads a half-written file from another worker
+    def _write_disk(self, key, text):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        # Workers share the directory, so it's measured again (and pruned if over the limit) every
+        # sixteenth of the limit this process writes, rather than trusting a per-process count
+        with self._lock:
+            self._disk_written += len(text)
+            due = self._disk_written >= self.max_disk_bytes // 16
+            if due:
+                self._disk_written = 0
+        if due:
+            self._prune_disk()
+
+    # Delete the least recently used disk entries until the directory is back under 3/4 of max_disk_bytes
+    def _prune_disk(self):
+        files = []
+        try:
+            with os.scandir(self.disk_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.json'):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_disk_bytes:
+            return
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes * 3 // 4:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,346 @@
+import hashlib
+import importlib
+import json
+import os
+from functools import lru_cache
+
+import plotly.express as px
+import plotly.graph_objs as go
+from plotly.subplots import make_subplots
+
+from aggregation import HEATMAP_MAX_CELLS, HISTOGRAM_BINS, POINT_BUDGET, downsample, histogram_bins, min_max_decimate, pivot_matrix
+from analytics import ROLLING_WINDOW
+from figure_cache import serialize_figure
+from metrics import span
+
+# Modules whose code decides what a figure looks like for given data (see figure_fingerprint)
+FIGURE_MODULES = ['figures', 'aggregation', 'analytics', 'comparison', 'data_store']
+
+# Define your color palette
+color_palette = ['#3366CC', '#DC3912', '#FF9900', '#109618', '#990099']
+
+
+# Function to apply a consistent layout to figures
+def apply_fig_styles(fig):
+    with span('style'):
+        fig.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)',  # Making plot background transparent
+            paper_bgcolor='rgba(0,0,0,0)',  # Making paper background transparent
+            font=dict(size=10),  # Adjusting font size
+            margin=dict(l=20, r=20, t=40, b=20)  # Tightening figure margins
+        )
+    return fig
+
+
+# Function to build the placeholder figure shown when a slice has no data
+def no_data_figure():
+    fig = go.Figure()
+    fig.add_annotation(text="No data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper")
+    return fig
+
+
+# Line graph comparing South Korea with the median of its peer countries
+# (plot_data holds the Year/Series/Value frame from IndicatorCube.compare)
+def build_line_figure(plot_data, selected_indicator, selected_years):
+    if plot_data.empty:
+        return no_data_figure()
+    line_fig = px.line(
+        downsample(plot_data, group_column='Series'),
+        x='Year',
+        y='Value',
+        color='Series',
+        title='Comparison with National Trends',
+        labels={'Value': 'Unemployment Rate (%)', 'Year': 'Year', 'Series': ''},
+        color_discrete_sequence=['#757DBE', '#DC3912']
+    )
+    return apply_fig_styles(line_fig)
+
+
+# Bar Chart for comparing unemployment indicators in the selected year
+def build_bar_figure(plot_data, selected_indicator, selected_years):
+    if plot_data.empty:
+        return no_data_figure()
+    bar_fig = px.bar(
+        plot_data,
+        x='Year',
+        y='Value',
+        title=f'Unemployment Indicators from {selected_years[0]} to {selected_years[1]}',
+        color_discrete_sequence=['#318F95']
+    )
+    return apply_fig_styles(bar_fig)
+
+
+# Scatter Plot of the selected indicator, with point size following the value
+def build_scatter_figure(plot_data, selected_indicator, selected_years):
+    plot_data = plot_data.dropna(subset=['Value'])
+    if plot_data.empty:
+        return no_data_figure()
+    scatter_fig = px.scatter(
+        downsample(plot_data, method=min_max_decimate),
+        x='Year',
+        y='Value',
+        size='Value',  # Adjusting the size of data points based on the value
+        title='Comparison of Unemployment Trends Over Time',
+        color_discrete_sequence=['#E64E44'],  # Using a continuous color scale
+        labels={'Value': 'Unemployment Rate (%)'},  # Label for the size axis
+        size_max=20,  # Maximum size of data points
+    )
+    return apply_fig_styles(scatter_fig)
+
+
+# Pie Chart for the distribution of unemployment indicators in the selected year
+def build_pie_figure(plot_data, selected_indicator, selected_years):
+    plot_data = plot_data.dropna(subset=['Value'])
+    if plot_data.empty:
+        return no_data_figure()
+    pie_fig = px.pie(
+        plot_data,
+        values='Value',
+        names='Year',
+        title=f'Distribution of Unemployment Indicators from {selected_years[0]} to {selected_years[1]}',
+        labels={'Value': 'Unemployment Rate (%)'}  # Label for the value axis
+    )
+    pie_fig.update_traces(hoverinfo='label+percent', textinfo='percent+label', textfont_size=14)
+    pie_fig.update_layout(scene=dict(aspectmode="cube"))
+    return apply_fig_styles(pie_fig)
+
+
+# Line Chart showing variability of the selected indicator over years
+def build_variability_figure(plot_data, selected_indicator, selected_years):
+    plot_data = plot_data.dropna(subset=['Value'])
+    if plot_data.empty:
+        return no_data_figure()
+    line_fig_variability = px.line(
+        downsample(plot_data),
+        x='Year',
+        y='Value',
+        title=f'Variability of {selected_indicator}',
+        color_discrete_sequence=['#8B5A37']
+    )
+    return apply_fig_styles(line_fig_variability)
+
+
+# Histogram showing the distribution of values for the selected indicator.
+# Bins are computed here, so the payload is one bar per bin however many values there are.
+def build_histogram_figure(plot_data, selected_indicator, selected_years):
+    plot_data = plot_data.dropna(subset=['Value'])
+    if plot_data.empty:
+        return no_data_figure()
+    centres, counts, edges = histogram_bins(plot_data['Value'].to_numpy())
+    hist_fig = px.histogram(
+        x=centres,
+        y=counts,
+        histfunc='sum',
+        nbins=len(counts),
+        title=f'Distribution of {selected_indicator}',
+        labels={'x': 'Value', 'y': 'count'},
+        color_discrete_sequence=color_palette
+    )
+    hist_fig.update_traces(xbins=dict(start=edges[0], end=edges[-1], size=edges[1] - edges[0]))
+    hist_fig.update_layout(yaxis_title='count')
+    return apply_fig_styles(hist_fig)
+
+
+# Area Plot of the selected indicator
+def build_area_figure(plot_data, selected_indicator, selected_years):
+    plot_data = plot_data.dropna(subset=['Value'])
+    if plot_data.empty:
+        return no_data_figure()
+    area_fig = px.area(
+        downsample(plot_data),
+        x='Year',
+        y='Value',
+        title=f'Area Plot of {selected_indicator}',
+        color_discrete_sequence=['#694BAF']
+    )
+    return apply_fig_styles(area_fig)
+
+
+# Heatmap of values by country and year
+def build_heatmap_figure(plot_data, selected_indicator, selected_years):
+    plot_data = plot_data.dropna(subset=['Value'])
+    if plot_data.empty:
+        return no_data_figure()
+    matrix, years, countries = pivot_matrix(plot_data, 'Year', 'Country Name', 'Value')
+    heatmap_fig = px.imshow(
+        matrix,
+        x=countries,
+        y=years,
+        labels=dict(x='Country Name', y='Year', color='Value'),
+        title='Unemployment by Country and Year'
+        # No color_discrete_sequence as this is not a parameter for imshow
+    )
+    return apply_fig_styles(heatmap_fig)
+
+
+# Bubble Chart of the selected indicator, one colour per year
+def build_bubble_figure(plot_data, selected_indicator, selected_years):
+    plot_data = downsample(plot_data.dropna(subset=['Value']), method=min_max_decimate)
+    if plot_data.empty:
+        return no_data_figure()
+    bubble_fig = px.scatter(
+        plot_data,
+        x='Year',
+        y='Value',
+        size='Value',
+        color=plot_data['Year'].astype(str),  # Discrete colour per year
+        title='Unemployment Over Time',
+        color_discrete_sequence=color_palette
+    )
+    return apply_fig_styles(bubble_fig)
+
+
+# Volatility of the selected indicator: year-over-year change and rolling standard deviation
+# (plot_data holds the Year/Series/Value frame from IndicatorAnalytics.volatility_frame)
+def build_volatility_figure(plot_data, selected_indicator, selected_years):
+    plot_data = plot_data.dropna(subset=['Value'])
+    if plot_data.empty:
+        return no_data_figure()
+    volatility_fig = px.line(
+        plot_data,
+        x='Year',
+        y='Value',
+        color='Series',
+        hover_data=['CV (%)', 'Z-score'],
+        title=f'Volatility of {selected_indicator}',
+        labels={'Value': 'Percentage points', 'Series': ''},
+        color_discrete_sequence=['#318F95', '#E64E44']
+    )
+    return apply_fig_styles(volatility_fig)
+
+
+# Least-squares trend of the selected indicator with its 95% confidence band
+# (plot_data holds the frame from IndicatorAnalytics.trend_frame, with the slope in plot_data.attrs)
+def build_trend_figure(plot_data, selected_indicator, selected_years):
+    if plot_data.empty or plot_data['Value'].notna().sum() < 3:
+        return no_data_figure()
+    trend_fig = go.Figure([
+        go.Scatter(x=plot_data['Year'], y=plot_data['Upper'], mode='lines', line=dict(width=0),
+                   showlegend=False, hoverinfo='skip'),
+        go.Scatter(x=plot_data['Year'], y=plot_data['Lower'], mode='lines', line=dict(width=0),
+                   fill='tonexty', fillcolor='rgba(117,125,190,0.25)', name='95% confidence band'),
+        go.Scatter(x=plot_data['Year'], y=plot_data['Fit'], mode='lines', line=dict(color='#757DBE'), name='Trend'),
+        go.Scatter(x=plot_data['Year'], y=plot_data['Value'], mode='markers', marker=dict(color='#DC3912'), name='Observed'),
+    ])
+    slope, slope_ci = plot_data.attrs['slope'], plot_data.attrs['slope_ci']
+    trend_fig.update_layout(
+        title=f'Trend: {slope:+.3f} per year (± {slope_ci:.3f}, 95% CI)',
+        xaxis_title='Year',
+        yaxis_title='Value',
+    )
+    return apply_fig_styles(trend_fig)
+
+
+# Indicators picked by a query, one line each, averaged over the matched countries
+# (plot_data holds the frame from IndicatorDatabase.query; not in CHART_BUILDERS as it isn't tied to one indicator)
+def build_query_figure(plot_data, query, selected_years):
+    if plot_data.empty:
+        return no_data_figure()
+    query_fig = px.line(
+        downsample(plot_data, group_column='Indicator'),
+        x='Year',
+        y='Value',
+        color='Indicator',
+        hover_data=['Indicator Code', 'Countries'],
+        title=f'Query: {query}',
+        labels={'Indicator': ''},
+    )
+    query_fig.update_layout(legend=dict(orientation='h', yanchor='top', y=-0.2))
+    return apply_fig_styles(query_fig)
+
+
+# Every chart on the dashboard: graph id -> (builder, the data it is built from).
+# 'indicator' is the selected indicator's slice, 'comparison' the country vs. peers frame, and
+# 'volatility' / 'trend' the derived metrics of the selected indicator (see analytics.py).
+CHART_BUILDERS = {
+    'line-graph': (build_line_figure, 'comparison'),
+    'bar-chart': (build_bar_figure, 'indicator'),
+    'scatter-plot': (build_scatter_figure, 'indicator'),
+    'pie-chart': (build_pie_figure, 'indicator'),
+    'line-fig-variability': (build_variability_figure, 'indicator'),
+    'histogram': (build_histogram_figure, 'indicator'),
+    'area-plot': (build_area_figure, 'indicator'),
+    'heatmap': (build_heatmap_figure, 'indicator'),
+    'bubble-chart': (build_bubble_figure, 'indicator'),
+    'volatility-chart': (build_volatility_figure, 'volatility'),
+    'trend-chart': (build_trend_figure, 'trend'),
+}
+
+
+# Charts of several selected indicators at once: graph id -> kind of trace drawn per indicator
+COMPARE_CHARTS = {
+    'compare-line': 'line',
+    'compare-area': 'area',
+    'compare-bar': 'bar',
+}
+
+COMPARE_TITLES = {'line': 'Selected Indicators', 'area': 'Area Plot of Selected Indicators', 'bar': 'Selected Indicators by Year'}
+
+
+# Function to build one indicator's trace for a comparison chart, serialized so it can be cached and reused
+# whichever other indicators it is shown with (plot_data holds that indicator's rows from IndicatorStore.slice_many)
+def build_indicator_trace(kind, plot_data, selected_indicator):
+    plot_data = plot_data.dropna(subset=['Value'])
+    if kind == 'bar':
+        trace = go.Bar(x=plot_data['Year'], y=plot_data['Value'], name=selected_indicator)
+    else:
+        plot_data = downsample(plot_data)
+        trace = go.Scatter(
+            x=plot_data['Year'], y=plot_data['Value'], name=selected_indicator, mode='lines',
+            fill='tozeroy' if kind == 'area' else None,
+        )
+    return serialize_figure(go.Figure(trace))['data'][0]
+
+
+# Layout of a comparison chart: one set of axes for overlay, or one row per indicator for small multiples.
+# Cached, as it only depends on the facet titles (none for overlay) and year range, not the data.
+@lru_cache(maxsize=64)
+def compare_layout(kind, titles, layout_mode, selected_years):
+    title = f'{COMPARE_TITLES[kind]}, {selected_years[0]} to {selected_years[1]}'
+    if layout_mode == 'facets':
+        fig = make_subplots(
+            rows=len(titles), cols=1, shared_xaxes=True, vertical_spacing=0.25 / len(titles),
+            subplot_titles=[name if len(name) <= 60 else name[:57] + '...' for name in titles],
+        )
+        fig.update_annotations(font_size=10)
+        fig.update_layout(title=title, showlegend=False, height=max(450, 160 * len(titles)))
+    else:
+        fig = go.Figure()
+        fig.update_layout(title=title, barmode='group', legend=dict(orientation='h', yanchor='top', y=-0.2))
+    return serialize_figure(apply_fig_styles(fig))['layout']
+
+
+# Function to put cached per-indicator traces together into one figure, colouring them by position in the selection
+def compose_compare_figure(kind, traces, selected_indicators, layout_mode, selected_years):
+    if not any(trace.get('x') for trace in traces):
+        return serialize_figure(apply_fig_styles(no_data_figure()))
+    data = []
+    for i, trace in enumerate(traces):
+        color = color_palette[i % len(color_palette)]
+        trace = dict(trace, marker={'color': color}) if kind == 'bar' else dict(trace, line={'color': color})
+        if layout_mode == 'facets' and i:
+            trace.update(xaxis=f'x{i + 1}', yaxis=f'y{i + 1}')
+        data.append(trace)
+    titles = tuple(selected_indicators) if layout_mode == 'facets' else ()
+    return {'data': data, 'layout': compare_layout(kind, titles, layout_mode, tuple(selected_years))}
+
+
+# Function to fingerprint everything besides the data that changes what a figure looks like: the settings,
+# plus the source of FIGURE_MODULES and any extra_modules, so figures cached on disk or exported by older
+# code or under other settings aren't served after a deploy
+@lru_cache(maxsize=None)
+def figure_fingerprint(*extra_modules):
+    settings = {
+        'charts': list(CHART_BUILDERS),
+        'max_points': POINT_BUDGET,
+        'heatmap_max_cells': HEATMAP_MAX_CELLS,
+        'histogram_bins': HISTOGRAM_BINS,
+        'rolling_window': ROLLING_WINDOW,
+        'comparison_country': os.environ.get('COMPARISON_COUNTRY', 'KOR'),
+        'comparison_peers': os.environ.get('COMPARISON_PEERS', ''),
+    }
+    digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    for name in FIGURE_MODULES + list(extra_modules):
+        with open(importlib.import_module(name).__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
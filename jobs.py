@@ -0,0 +1,47 @@
+import os
+import time
+
+# Seconds between checks while waiting on another process's computation
+POLL_INTERVAL = 0.1
+
+
+# Function to check whether a process is still running
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Function to compute a value once per key across every process sharing a diskcache.Cache.
+# The first caller runs compute() and stores the result; concurrent callers with the same key wait
+# for it instead of computing it again. If the running process is killed (e.g. its job was cancelled),
+# a waiting caller takes over. Results and locks expire after expire seconds. Results that cacheable(result)
+# rejects (e.g. ones carrying an error) are returned but not stored, so the next caller computes afresh.
+def single_flight(cache, key, compute, expire=None, cacheable=None):
+    result_key = ('result',) + tuple(key)
+    lock_key = ('running',) + tuple(key)
+    while True:
+        result = cache.get(result_key)
+        if result is not None:
+            return result
+
+        if cache.add(lock_key, os.getpid(), expire=expire):
+            try:
+                result = compute()
+                if cacheable is None or cacheable(result):
+                    cache.set(result_key, result, expire=expire)
+                return result
+            finally:
+                cache.delete(lock_key)
+
+        owner = cache.get(lock_key)
+        if owner is not None and not pid_alive(owner):
+            with cache.transact():
+                if cache.get(lock_key) == owner:
+                    cache.delete(lock_key)
+            continue
+        time.sleep(POLL_INTERVAL)
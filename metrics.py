@@ -0,0 +1,276 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+# Instrumentation is off unless METRICS_ENABLED is set; when off, every helper here is a no-op
+ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+# Optional structured (JSON lines) log with one entry per request
+REQUEST_LOG = ENABLED and os.environ.get('METRICS_REQUEST_LOG', '').lower() in ('1', 'true', 'yes')
+
+# With several worker processes (serve.py), each one keeps its own registry. When METRICS_MULTIPROC_DIR is set,
+# every process writes its metrics to a file there every METRICS_FLUSH_INTERVAL seconds, and /metrics adds up
+# all the files, so a scrape reports the totals of every worker whichever one answers it. Files of exited
+# workers are kept, so totals never go backwards; the directory should start out empty (serve.py clears it).
+MULTIPROC_DIR = ENABLED and os.environ.get('METRICS_MULTIPROC_DIR') or None
+FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+
+# Histogram buckets (seconds) for stage and request durations
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Help text for every metric, also used as the list of metrics /metrics describes
+METRIC_HELP = {
+    'dashboard_stage_seconds': ('histogram', 'Time spent in each stage of building a chart (slice, build, style, serialize).'),
+    'dashboard_figure_cache_total': ('counter', 'Figure cache lookups by chart and result (hit, export or miss).'),
+    'dashboard_callback_errors_total': ('counter', 'Chart callbacks that failed, by chart.'),
+    'dashboard_payload_bytes_total': ('counter', 'Serialized figure bytes returned, by chart.'),
+    'dashboard_http_requests_total': ('counter', 'HTTP requests by path and status.'),
+    'dashboard_http_request_seconds': ('histogram', 'HTTP request duration by path.'),
+}
+
+logger = logging.getLogger('dashboard.metrics')
+request_logger = logging.getLogger('dashboard.requests')
+
+# Chart currently being built, so nested spans (e.g. styling inside a builder) are labelled with it
+_current_chart = ContextVar('current_chart', default=None)
+
+
+# Thread-safe registry of labelled counters and histograms
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.changes = 0       # bumped on every update, so unchanged metrics aren't written out again
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self.changes += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        bucket = bisect_left(DURATION_BUCKETS, value)
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0, 0]
+            state[bucket] += 1
+            state[-2] += value
+            state[-1] += 1
+            self.changes += 1
+
+    # Copy of every metric, as ({(name, labels): value}, {(name, labels): histogram state})
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters), {key: list(state) for key, state in self._histograms.items()}
+
+    # Render every metric in the Prometheus text exposition format; with snapshots (from several
+    # processes, see MultiprocessStore), render their sum instead of this registry
+    def render(self, snapshots=None):
+        counters, histograms = merge_snapshots(snapshots) if snapshots is not None else self.snapshot()
+        lines = []
+        for name, (kind, help_text) in METRIC_HELP.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+            for (metric, labels), state in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS + (float('inf'),), state):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {state[-2]}')
+                lines.append(f'{name}_count{format_labels(labels)} {state[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{key}="{escape_label(value)}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Function to add up metric snapshots taken in several processes
+def merge_snapshots(snapshots):
+    counters, histograms = {}, {}
+    for snapshot_counters, snapshot_histograms in snapshots:
+        for key, value in snapshot_counters.items():
+            counters[key] = counters.get(key, 0) + value
+        for key, state in snapshot_histograms.items():
+            total = histograms.setdefault(key, [0] * len(state))
+            for i, value in enumerate(state):
+                total[i] += value
+    return counters, histograms
+
+
+# Per-process metric files in a directory shared by every worker (see METRICS_MULTIPROC_DIR)
+class MultiprocessStore:
+    def __init__(self, directory, interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._path = None
+        self._flushed = None
+
+    # Start writing this process's registry out in the background (once per process; threads don't survive a fork)
+    def start(self, registry):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # Named by start time too, so a reused pid doesn't overwrite an exited worker's totals
+            self._path = os.path.join(self.directory, f'{self._pid}-{time.time_ns()}.json')
+            self._flushed = None
+        threading.Thread(target=self._flush_loop, args=(registry,), name='metrics-flusher', daemon=True).start()
+        atexit.register(self.flush, registry)
+
+    # Write registry to this process's file if it changed since the last write
+    def flush(self, registry):
+        with self._lock:
+            if self._pid != os.getpid() or registry.changes == self._flushed:
+                return
+            self._flushed = registry.changes
+            counters, histograms = registry.snapshot()
+            entries = {
+                'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                'histograms': [[name, labels, state] for (name, labels), state in histograms.items()],
+            }
+            tmp_path = f'{self._path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self._path)
+
+    # Snapshots of every process that wrote to the directory
+    def collect(self):
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((
+                {(name, tuple(map(tuple, labels))): value for name, labels, value in entries['counters']},
+                {(name, tuple(map(tuple, labels))): state for name, labels, state in entries['histograms']},
+            ))
+        return snapshots
+
+    def _flush_loop(self, registry):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush(registry)
+            except OSError:
+                logger.exception('Failed to write metrics to %s', self.directory)
+
+
+registry = Registry()
+
+multiprocess = MultiprocessStore(MULTIPROC_DIR) if MULTIPROC_DIR else None
+
+
+def inc(name, amount=1, **labels):
+    if ENABLED:
+        registry.inc(name, amount, **labels)
+
+
+@contextmanager
+def _timed_span(stage, chart):
+    token = _current_chart.set(chart) if chart is not None else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe('dashboard_stage_seconds', time.perf_counter() - start,
+                         stage=stage, chart=chart or _current_chart.get() or '')
+        if token is not None:
+            _current_chart.reset(token)
+
+
+_NO_SPAN = nullcontext()
+
+
+# Time a stage of building a chart: `with span('build', chart='bar-chart'): ...`
+def span(stage, chart=None):
+    if not ENABLED:
+        return _NO_SPAN
+    return _timed_span(stage, chart)
+
+
+# Add the /metrics route and per-request timing (plus the optional request log) to the Flask server
+def instrument_server(server):
+    if not ENABLED:
+        return
+
+    from flask import Response, g, request
+
+    if REQUEST_LOG and not request_logger.handlers:
+        request_logger.addHandler(logging.StreamHandler())
+        request_logger.setLevel(logging.INFO)
+        request_logger.propagate = False
+
+    @server.route('/metrics')
+    def metrics():
+        if multiprocess is None:
+            return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+        multiprocess.start(registry)
+        multiprocess.flush(registry)
+        return Response(registry.render(multiprocess.collect()), mimetype='text/plain; version=0.0.4')
+
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        if multiprocess is not None:
+            multiprocess.start(registry)
+
+    @server.after_request
+    def record_request(response):
+        start = getattr(g, 'metrics_start', None)
+        if start is None or request.path == '/metrics':
+            return response
+        duration = time.perf_counter() - start
+        # Label by route rule rather than raw path, so unknown URLs can't create unbounded label sets
+        path = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        registry.inc('dashboard_http_requests_total', path=path, status=response.status_code)
+        registry.observe('dashboard_http_request_seconds', duration, path=path)
+        if REQUEST_LOG:
+            entry = {
+                'path': request.path,
+                'method': request.method,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 3),
+                'bytes': response.calculate_content_length(),
+            }
+            if request.path.endswith('_dash-update-component'):
+                body = request.get_json(silent=True) or {}
+                entry['output'] = body.get('output')
+                # The view asked for, so the most requested ones can be prerendered at startup (see serve.py)
+                entry['inputs'] = {
+                    f"{i.get('id')}.{i.get('property')}": i.get('value') for i in body.get('inputs', []) if isinstance(i, dict)
+                }
+            request_logger.info(json.dumps(entry))
+        return response
@@ -0,0 +1,339 @@
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_store import ID_COLUMNS, file_hash
+
+# Bump when the database schema changes so old database files are rebuilt
+DATABASE_FORMAT_VERSION = 1
+
+# Rows read from the CSV per batch while building the database
+BUILD_CHUNK_ROWS = 20000
+
+# Names of the World Bank topics, keyed by the first segment of the indicator code
+TOPICS = {
+    'AG': 'Agriculture', 'BM': 'Balance of payments', 'BN': 'Balance of payments', 'BX': 'Balance of payments',
+    'CM': 'Stock markets', 'DT': 'External debt', 'EG': 'Energy', 'EN': 'Environment', 'ER': 'Environment',
+    'FB': 'Financial sector', 'FD': 'Financial sector', 'FM': 'Financial sector', 'FP': 'Prices',
+    'FR': 'Financial sector', 'FS': 'Financial sector', 'GC': 'Public sector', 'IC': 'Private sector',
+    'IP': 'Intellectual property', 'IS': 'Infrastructure', 'IT': 'Infrastructure', 'MS': 'Military',
+    'NE': 'National accounts', 'NV': 'National accounts', 'NY': 'National accounts', 'PA': 'Exchange rates',
+    'SE': 'Education', 'SG': 'Gender', 'SH': 'Health', 'SI': 'Poverty and inequality', 'SL': 'Labor',
+    'SM': 'Migration', 'SN': 'Nutrition', 'SP': 'Population', 'ST': 'Tourism', 'TM': 'Trade', 'TX': 'Trade',
+    'VC': 'Violence',
+}
+
+SCHEMA = [
+    'CREATE TABLE countries (code TEXT PRIMARY KEY, name TEXT)',
+    'CREATE TABLE indicators (code TEXT PRIMARY KEY, name TEXT, topic TEXT, topic_name TEXT)',
+    # Only observed values are stored; World Bank extracts are mostly empty cells
+    'CREATE TABLE observations (indicator_code TEXT, country_code TEXT, year INTEGER, value REAL, '
+    'PRIMARY KEY (indicator_code, country_code, year)) WITHOUT ROWID',
+]
+
+# Created after the bulk load, which is much faster than maintaining them row by row
+INDEXES = [
+    'CREATE INDEX observations_country_year ON observations (country_code, year)',
+    'CREATE INDEX observations_year ON observations (year)',
+    'CREATE INDEX indicators_topic ON indicators (topic)',
+]
+
+# Columns a query expression may use, and what they refer to in the query
+QUERY_COLUMNS = {
+    'indicator_code': 'o.indicator_code',
+    'indicator_name': 'i.name',
+    'country_code': 'o.country_code',
+    'topic': 'i.topic',
+    'year': 'o.year',
+    'value': 'o.value',
+}
+QUERY_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'LIKE', 'IS', 'NULL'}
+QUERY_TOKEN = re.compile(
+    r"\s*(?:(?P<number>\d+(?:\.\d+)?)|(?P<string>'(?:[^']|'')*')|(?P<op><=|>=|<>|!=|=|<|>|\(|\)|,|-)|(?P<word>[A-Za-z_]+))"
+)
+QUERY_MAX_LENGTH = 500
+
+# Tables and functions the engine's own queries touch; everything else is refused by the authorizer
+READABLE_TABLES = {'countries', 'indicators', 'observations'}
+ALLOWED_FUNCTIONS = {'avg', 'count', 'min', 'max', 'sum', 'like', 'glob'}
+
+
+class QueryError(ValueError):
+    pass
+
+
+# Function to check a user-supplied filter expression and rewrite its column names for the query.
+# Only comparisons of the QUERY_COLUMNS against literals, combined with AND/OR/NOT, BETWEEN, IN, LIKE
+# and IS NULL, are accepted; there are no function calls, subqueries or statement separators.
+def compile_expression(expression):
+    if len(expression) > QUERY_MAX_LENGTH:
+        raise QueryError(f"Expression is longer than {QUERY_MAX_LENGTH} characters")
+    tokens, position = [], 0  # (kind, SQL text, text as typed)
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = QUERY_TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise QueryError(f"Unexpected input at: {expression[position:position + 20]!r}")
+        position = match.end()
+        kind, token = match.lastgroup, match.group(match.lastgroup)
+        if kind == 'word':
+            if token.lower() in QUERY_COLUMNS:
+                tokens.append(('column', QUERY_COLUMNS[token.lower()], token))
+            elif token.upper() in QUERY_KEYWORDS:
+                tokens.append(('keyword', token.upper(), token))
+            else:
+                raise QueryError(f"Unknown name {token!r}; use {', '.join(QUERY_COLUMNS)}")
+        else:
+            tokens.append((kind, token, token))
+    check_expression(tokens)
+    return ' '.join(sql for _, sql, _ in tokens)
+
+
+# Function to check compile_expression's tokens against the expression grammar, so a malformed filter gets
+# a message saying what was expected where rather than an SQLite syntax error:
+#   expression := condition ((AND | OR) condition)*
+#   condition  := NOT condition | '(' expression ')' | operand IS [NOT] NULL
+#               | operand [NOT] (BETWEEN operand AND operand | IN '(' operand (',' operand)* ')' | LIKE operand)
+#               | operand (= | <> | != | < | <= | > | >=) operand
+#   operand    := column | number | '-' number | 'text'
+def check_expression(tokens):
+    position = 0
+
+    def fail(expected):
+        found = repr(tokens[position][2]) if position < len(tokens) else 'the end of the query'
+        raise QueryError(f"Expected {expected} but found {found}")
+
+    def accept(*accepted):
+        nonlocal position
+        if position < len(tokens) and tokens[position][1] in accepted:
+            position += 1
+            return True
+        return False
+
+    def expect(token):
+        if not accept(token):
+            fail(repr(token))
+
+    def operand():
+        nonlocal position
+        negative = accept('-')
+        kind = tokens[position][0] if position < len(tokens) else None
+        if kind == 'number' or (not negative and kind in ('column', 'string')):
+            position += 1
+        else:
+            fail('a number' if negative else 'a column, number or quoted text')
+
+    def condition():
+        if accept('NOT'):
+            condition()
+        elif accept('('):
+            expression()
+            expect(')')
+        else:
+            operand()
+            if accept('IS'):
+                accept('NOT')
+                expect('NULL')
+                return
+            negated = accept('NOT')
+            if accept('BETWEEN'):
+                operand()
+                expect('AND')
+                operand()
+            elif accept('IN'):
+                expect('(')
+                operand()
+                while accept(','):
+                    operand()
+                expect(')')
+            elif accept('LIKE') or (not negated and accept('=', '<>', '!=', '<', '<=', '>', '>=')):
+                operand()
+            else:
+                fail('a comparison (=, <, >, BETWEEN, IN, LIKE or IS NULL)')
+
+    def expression():
+        condition()
+        while accept('AND', 'OR'):
+            condition()
+
+    if tokens:
+        expression()
+        if position < len(tokens):
+            fail('AND or OR')
+
+
+# Function to split a query into indicator selectors (prefix:, topic:, keyword:) and a filter expression
+def parse_query(query):
+    selectors = {'prefix': [], 'topic': [], 'keyword': []}
+    rest = []
+    after_selector = False
+    for term in re.findall(r"\w+:(?:'[^']*'|\S+)|'(?:[^']|'')*'|\S+", query or ''):
+        name, _, value = term.partition(':')
+        is_selector = bool(value) and name.lower() in selectors
+        if (is_selector and rest and rest[-1].upper() in ('OR', 'NOT')) or (after_selector and term.upper() == 'OR'):
+            raise QueryError(
+                "prefix:, topic: and keyword: always narrow the query (they're combined with AND); "
+                "they can't be joined with OR or negated with NOT"
+            )
+        if is_selector:
+            selectors[name.lower()].append(value.strip("'"))
+            # Selectors are always ANDed with the expression, so drop an AND joining them to it
+            if rest and rest[-1].upper() == 'AND':
+                rest.pop()
+            after_selector = True
+        elif after_selector and term.upper() == 'AND' and not rest:
+            after_selector = False
+        else:
+            rest.append(term)
+            after_selector = False
+    return selectors, ' '.join(rest)
+
+
+def deny_unexpected(action, table, column, database, trigger):
+    if action == sqlite3.SQLITE_SELECT:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_READ and table in READABLE_TABLES:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_FUNCTION and (column or '').lower() in ALLOWED_FUNCTIONS:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+# Read-only SQLite database of World Bank observations (indicator x country x year), indexed for
+# filtering and aggregating inside the engine, so only the aggregated result reaches pandas
+class IndicatorDatabase:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    # One read-only connection per thread (sqlite3 connections can't be shared across threads)
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            connection.set_authorizer(deny_unexpected)
+            self._local.connection = connection
+        return connection
+
+    # Build the database at path from wide World Bank CSV extracts, writing to a temporary file first
+    @classmethod
+    def build(cls, paths, path):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        connection = sqlite3.connect(tmp_path)
+        try:
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('PRAGMA synchronous = OFF')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            for source in paths:
+                for chunk in pd.read_csv(source, chunksize=BUILD_CHUNK_ROWS):
+                    cls._insert(connection, chunk)
+            for statement in INDEXES:
+                connection.execute(statement)
+            connection.execute('ANALYZE')
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    @staticmethod
+    def _insert(connection, chunk):
+        year_columns = [column for column in chunk.columns if column not in ID_COLUMNS and column.isdigit()]
+        countries = chunk.drop_duplicates('Country Code')
+        connection.executemany(
+            'INSERT OR REPLACE INTO countries VALUES (?, ?)', zip(countries['Country Code'], countries['Country Name'])
+        )
+        indicators = chunk.drop_duplicates('Indicator Code')
+        topics = indicators['Indicator Code'].str.split('.').str[0]
+        connection.executemany(
+            'INSERT OR REPLACE INTO indicators VALUES (?, ?, ?, ?)',
+            zip(indicators['Indicator Code'], indicators['Indicator Name'], topics, topics.map(TOPICS)),
+        )
+        # Observed cells only, found in one vectorized pass over the year columns
+        values = chunk[year_columns].to_numpy(dtype='float64')
+        rows, columns = np.nonzero(~np.isnan(values))
+        years = np.array(year_columns, dtype='int64')
+        connection.executemany('INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?)', zip(
+            chunk['Indicator Code'].to_numpy()[rows],
+            chunk['Country Code'].to_numpy()[rows],
+            years[columns].tolist(),
+            values[rows, columns].tolist(),
+        ))
+
+    # Run a query (selectors plus an optional filter expression, see parse_query) for the years
+    # start_year..end_year, averaging each indicator per year inside the engine. Without a country_code
+    # condition in the expression, only country_code's observations are used. Returns a long frame
+    # (Indicator Code, Indicator, Year, Value, Countries) of at most max_series indicators.
+    def query(self, query, country_code, start_year, end_year, max_series=10):
+        selectors, expression = parse_query(query)
+        conditions, parameters = self._selector_conditions(**selectors)
+        conditions.append('o.year BETWEEN ? AND ?')
+        parameters += [int(start_year), int(end_year)]
+        if expression:
+            compiled = compile_expression(expression)
+            if 'o.country_code' not in compiled:
+                conditions.append('o.country_code = ?')
+                parameters.append(country_code)
+            conditions.append(f'({compiled})')
+        else:
+            conditions.append('o.country_code = ?')
+            parameters.append(country_code)
+
+        sql = f"""
+            WITH matched AS (
+                SELECT o.indicator_code, o.year, o.value FROM observations o
+                JOIN indicators i ON i.code = o.indicator_code
+                WHERE {' AND '.join(conditions)}
+            ),
+            series AS (SELECT DISTINCT indicator_code FROM matched ORDER BY indicator_code LIMIT {int(max_series)})
+            SELECT m.indicator_code, i.name, m.year, AVG(m.value), COUNT(*) FROM matched m
+            JOIN series s ON s.indicator_code = m.indicator_code
+            JOIN indicators i ON i.code = m.indicator_code
+            GROUP BY m.indicator_code, m.year
+            ORDER BY m.indicator_code, m.year
+        """
+        try:
+            rows = self.connection.execute(sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            raise QueryError(f"Invalid query: {e}") from e
+        frame = pd.DataFrame(rows, columns=['Indicator Code', 'Indicator', 'Year', 'Value', 'Countries'])
+        frame['Value'] = frame['Value'].astype('float64').round(6)
+        return frame
+
+    @staticmethod
+    def _selector_conditions(prefix=(), topic=(), keyword=()):
+        conditions, parameters = [], []
+        if prefix:
+            # GLOB is case sensitive, so SQLite can answer it from the primary key index
+            conditions.append('(' + ' OR '.join('i.code GLOB ?' for _ in prefix) + ')')
+            parameters += [value.replace('[', '[[]').replace('*', '[*]').replace('?', '[?]') + '*' for value in prefix]
+        if topic:
+            conditions.append('(' + ' OR '.join('(i.topic = ? OR i.topic_name LIKE ?)' for _ in topic) + ')')
+            for value in topic:
+                parameters += [value.upper(), f'%{value}%']
+        for value in keyword:
+            conditions.append('i.name LIKE ?')
+            parameters.append(f'%{value}%')
+        return conditions, parameters
+
+
+# Function to open the database for the given CSV extracts, building it first if needed. Like the other
+# data caches it lives in cache_dir (the system temp directory without one), keyed by a hash of the sources.
+def load_indicator_database(paths, cache_dir=None):
+    source_hash = hashlib.sha1('|'.join(file_hash(path) for path in paths).encode('utf-8')).hexdigest()
+    cache_dir = cache_dir or tempfile.gettempdir()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'indicators-{DATABASE_FORMAT_VERSION}-{source_hash[:16]}.sqlite')
+    if os.path.exists(path):
+        return IndicatorDatabase(path)
+    return IndicatorDatabase.build(paths, path)
@@ -0,0 +1,172 @@
+"""Run the dashboard in production under gunicorn (pip install gunicorn).
+
+    python serve.py                                  # one worker per available CPU on 0.0.0.0:8050
+    python serve.py --bind 0.0.0.0:8000 --workers 4 --threads 8
+    python serve.py --warmup-log requests.log --warmup-views 200
+
+The app is loaded once in the master process: the data is loaded, and the most requested views are
+prerendered into the figure cache. Workers are forked after that, so they share those pages
+copy-on-write and start warm. The most requested views are read from a METRICS_REQUEST_LOG log
+(--warmup-log), or default to every indicator's default view.
+GET /healthz is the liveness check. GET /readyz only returns 200 once warm-up is done.
+With METRICS_ENABLED, /metrics reports the totals of every worker, collected in METRICS_MULTIPROC_DIR
+(a temporary directory unless set).
+"""
+import argparse
+import gc
+import glob
+import importlib.util
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger('dashboard.serve')
+
+
+# Function to import economic-dashboard.py (its file name isn't a valid module name) as a module
+def load_dashboard(module_name='dashboard'):
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, 'economic-dashboard.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# Function to count the CPUs this process may actually use: its CPU affinity, capped by a cgroup CPU quota
+# (e.g. a container's --cpus limit) when there is one
+def available_cpus():
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    try:
+        with open('/sys/fs/cgroup/cpu.max', 'r', encoding='utf-8') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+# Function to rank the views in a METRICS_REQUEST_LOG log by how often they were requested.
+# Returns [(indicator, [start, end]), ...], most requested first.
+def read_view_log(path):
+    counts = Counter()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            try:
+                inputs = json.loads(line).get('inputs') or {}
+            except (ValueError, AttributeError):
+                continue
+            indicator, years = inputs.get('indicator-dropdown.value'), inputs.get('year-range-slider.value')
+            if isinstance(indicator, str) and isinstance(years, list) and len(years) == 2:
+                counts[indicator, tuple(years)] += 1
+    return [(indicator, list(years)) for (indicator, years), _ in counts.most_common()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default=os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 8050)}"),
+                        help='address to listen on (default $BIND, or 0.0.0.0:$PORT with PORT defaulting to 8050)')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 0)) or available_cpus(),
+                        help='worker processes (default $WEB_WORKERS, or one per available CPU)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 4)),
+                        help='threads per worker (default $WEB_THREADS or 4)')
+    parser.add_argument('--timeout', type=int, default=60, help='seconds before a stuck worker is restarted (default 60)')
+    parser.add_argument('--warmup-log', default=os.environ.get('WARMUP_LOG'),
+                        help='METRICS_REQUEST_LOG output to pick the most requested views from (default $WARMUP_LOG)')
+    parser.add_argument('--warmup-views', type=int, default=int(os.environ.get('WARMUP_VIEWS', 100)),
+                        help='number of views to prerender before serving (default $WARMUP_VIEWS or 100, 0 for none); '
+                             'capped at what the figure cache holds, FIGURE_CACHE_SIZE / 11')
+    parser.add_argument('--access-log', action='store_true', help='log every request to stdout')
+    args = parser.parse_args()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        parser.error('serve.py needs gunicorn (pip install gunicorn)')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    os.chdir(ROOT)
+
+    # Each worker keeps its own metrics; they're added up from files in a shared directory (see metrics.py).
+    # Set before the app is imported, since metrics.py reads it at import time.
+    metrics_dir = None
+    if os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes'):
+        if os.environ.get('METRICS_MULTIPROC_DIR'):
+            os.makedirs(os.environ['METRICS_MULTIPROC_DIR'], exist_ok=True)
+            for path in glob.glob(os.path.join(os.environ['METRICS_MULTIPROC_DIR'], '*.json')):
+                os.remove(path)  # Totals of a previous run
+        else:
+            metrics_dir = os.environ['METRICS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='dashboard-metrics-')
+
+    started = time.perf_counter()
+    # The master only loads the app; the data source watcher is started in the workers (post_fork below).
+    # A watcher thread in the master would keep reloading data no request uses, and a fork while it holds
+    # the data source's lock would leave that lock held forever in the worker.
+    os.environ['SERVE_PRELOAD'] = '1'
+    dashboard = load_dashboard()
+    views = read_view_log(args.warmup_log) if args.warmup_log else None
+    rendered = dashboard.warm_up(views, limit=args.warmup_views)
+    # Workers report their own traffic, not the warm-up's cache misses
+    dashboard.metrics.registry.reset()
+    # Keep everything loaded so far out of the garbage collector's reach, so collections in the workers
+    # don't write to (and so copy) the pages they share with the master
+    gc.collect()
+    gc.freeze()
+    logger.info('Loaded data snapshot %s and prerendered %d views in %.1fs; starting %d workers x %d threads on %s',
+                dashboard.data_source.snapshot.version, rendered, time.perf_counter() - started,
+                args.workers, args.threads, args.bind)
+
+    # Start the data source watcher in each worker. A worker respawned later forks from the master's
+    # snapshot, so it first catches up with any change made since the master loaded the data (refresh
+    # compares the files against the stats that snapshot was loaded from).
+    def post_fork(server, worker):
+        if dashboard.DATA_RELOAD_INTERVAL <= 0:
+            return
+        dashboard.data_source.watch(dashboard.DATA_RELOAD_INTERVAL)
+        try:
+            dashboard.data_source.refresh()
+        except Exception:
+            # Serve the master's snapshot for now; the watcher retries on its next poll
+            logger.exception('Failed to reload data in worker %s', worker.pid)
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': args.bind,
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread',
+                'timeout': args.timeout,
+                'graceful_timeout': 30,
+                'keepalive': 5,
+                'preload_app': True,
+                'post_fork': post_fork,
+                'accesslog': '-' if args.access_log else None,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return dashboard.app.server
+
+    master_pid = os.getpid()
+    try:
+        DashboardApplication().run()
+    finally:
+        # Workers exit through here too (gunicorn raises SystemExit in them); only the master cleans up
+        if metrics_dir is not None and os.getpid() == master_pid:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; without it responses are precompressed with gzip only
+    brotli = None
+
+# Cache-Control for fingerprinted files: their URL changes whenever their content does
+LONG_CACHE = 'public, max-age=31536000, immutable'
+
+# Content encodings in order of preference
+ENCODINGS = ('br', 'gzip')
+
+
+# A response body kept alongside its precompressed variants and an ETag, so serving it is a dictionary lookup
+class CompressedPayload:
+    def __init__(self, body, mimetype):
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(body).hexdigest()[:16]
+        self.encoded = {'identity': body}
+        compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body)
+        # Only keep variants that are actually smaller
+        self.encoded.update({name: data for name, data in compressed.items() if len(data) < len(body)})
+
+    def response(self, request, cache_control):
+        from flask import Response
+
+        if self.etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            encoding = next(
+                (name for name in ENCODINGS if name in self.encoded and name in request.accept_encodings), 'identity'
+            )
+            response = Response(self.encoded[encoding], mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(self.etag)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+# Serves files from a directory under content-fingerprinted URLs (e.g. logo.3f2a9c1b7d.svg) with long-lived
+# cache headers, read and precompressed once on first use
+class StaticAssets:
+    def __init__(self, server, directory, route='/static-assets', url_prefix='/'):
+        self.directory = directory
+        self.route = route
+        self.url_prefix = url_prefix.rstrip('/')
+        self._payloads = {}  # fingerprinted name -> CompressedPayload
+        self._urls = {}      # file name -> fingerprinted URL
+        self._lock = threading.Lock()
+        server.add_url_rule(f'{route}/<path:name>', endpoint='static_assets', view_func=self._serve)
+
+    # Fingerprinted URL of a file in the directory
+    def url(self, filename):
+        with self._lock:
+            if filename not in self._urls:
+                with open(os.path.join(self.directory, filename), 'rb') as f:
+                    self._add(filename, f.read())
+            return self._urls[filename]
+
+    # Serve content generated at startup (rather than read from the directory) the same way; returns its URL
+    def register(self, filename, body):
+        with self._lock:
+            self._add(filename, body)
+            return self._urls[filename]
+
+    # Add a payload under its fingerprinted name (lock must be held)
+    def _add(self, filename, body):
+        stem, extension = os.path.splitext(filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        payload = CompressedPayload(body, mimetype)
+        fingerprinted = f'{stem}.{payload.etag[:10]}{extension}'
+        self._payloads[fingerprinted] = payload
+        self._urls[filename] = f'{self.url_prefix}{self.route}/{fingerprinted}'
+
+    def _serve(self, name):
+        from flask import abort, request
+
+        payload = self._payloads.get(name)
+        if payload is None:
+            abort(404)
+        return payload.response(request, LONG_CACHE)
@@ -0,0 +1,89 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_engine import QueryError, compile_expression, load_indicator_database, parse_query  # noqa: E402
+
+DATA_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data.csv')
+
+
+def test_compile_expression_rewrites_columns():
+    assert compile_expression("year >= 2000 AND value > 5") == 'o.year >= 2000 AND o.value > 5'
+    assert compile_expression("NOT (country_code IN ('KOR', 'JPN') OR value IS NULL)") == (
+        "NOT ( o.country_code IN ( 'KOR' , 'JPN' ) OR o.value IS NULL )"
+    )
+    assert compile_expression("year between 1990 and 2000 and indicator_name like '%youth%'") == (
+        "o.year BETWEEN 1990 AND 2000 AND i.name LIKE '%youth%'"
+    )
+    assert compile_expression("value > -1.5") == 'o.value > - 1.5'
+
+
+@pytest.mark.parametrize('expression', [
+    "value > 5; DROP TABLE observations",
+    "value > 5 -- comment",
+    "year = 2000 /* comment */",
+    "abs(value) > 5",
+    "value > (SELECT max(value) FROM observations)",
+    "SELECT * FROM observations",
+    "value IN (SELECT value FROM observations)",
+    "country_code = \"KOR\"",
+    "sqlite_version() = 1",
+    "value > 5 UNION SELECT 1",
+])
+def test_compile_expression_rejects_sql(expression):
+    with pytest.raises(QueryError):
+        compile_expression(expression)
+
+
+@pytest.mark.parametrize('expression', [
+    "OR value > 5",
+    "value > 5 AND",
+    "value >",
+    "year 2000",
+    "(value > 5",
+    "value > 5)",
+    "value NOT = 5",
+    "year BETWEEN 1990",
+    "value",
+])
+def test_compile_expression_rejects_malformed(expression):
+    with pytest.raises(QueryError, match='Expected|parenthes'):
+        compile_expression(expression)
+
+
+def test_compile_expression_rejects_long_input():
+    with pytest.raises(QueryError):
+        compile_expression(' AND '.join(['value > 1'] * 100))
+
+
+def test_parse_query_splits_selectors():
+    selectors, expression = parse_query("prefix:SL.UEM topic:labor AND year >= 2000 AND value > 5")
+    assert selectors == {'prefix': ['SL.UEM'], 'topic': ['labor'], 'keyword': []}
+    assert expression == 'year >= 2000 AND value > 5'
+
+
+@pytest.mark.parametrize('query', ["prefix:SL.UEM OR value > 5", "value > 5 OR keyword:youth", "value > 5 AND NOT topic:labor"])
+def test_parse_query_rejects_selectors_joined_with_or(query):
+    with pytest.raises(QueryError, match='combined with AND'):
+        parse_query(query)
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    return load_indicator_database([DATA_CSV], str(tmp_path_factory.mktemp('query')))
+
+
+def test_query_filters_and_averages(database):
+    frame = database.query("prefix:SL.UEM.TOTL year >= 2000", 'KOR', 1990, 2022, max_series=3)
+    assert len(frame)
+    assert frame['Indicator Code'].str.startswith('SL.UEM.TOTL').all()
+    assert frame['Year'].between(2000, 2022).all()
+    assert frame['Indicator Code'].nunique() <= 3
+
+
+def test_query_reports_invalid_filter(database):
+    with pytest.raises(QueryError, match='Expected'):
+        database.query("prefix:SL.UEM value > ", 'KOR', 1990, 2022)
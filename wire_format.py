@@ -0,0 +1,107 @@
+import base64
+import json
+
+import numpy as np
+import plotly.graph_objs as go
+import plotly.io as pio
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it the standard library json module is used
+    orjson = None
+
+# Arrays shorter than this are left as JSON lists; the typed array wrapper would outweigh the savings
+MIN_TYPED_ARRAY_LENGTH = 8
+
+# Floats are sent as float32 when every value survives the round trip within this relative error
+# (well below what hover labels and axis ticks show)
+FLOAT32_RTOL = 1e-6
+
+# Smallest integer type that holds every value, in Plotly's typed array dtype names
+INT_DTYPES = [('i1', np.int8), ('i2', np.int16), ('i4', np.int32)]
+
+# Keys whose values are never data arrays, so they're not worth inspecting
+SKIPPED_KEYS = {'type', 'name', 'hovertemplate', 'text', 'hovertext', 'legendgroup', 'uid'}
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+# Function to encode a list of numbers (None for gaps) or a rectangular list of such lists as a Plotly
+# typed array ({'dtype', 'bdata', 'shape'}), or return None when it isn't numeric or is too short to bother
+def encode_array(values):
+    if len(values) < MIN_TYPED_ARRAY_LENGTH and not (values and isinstance(values[0], list)):
+        return None
+    try:
+        array = np.array(values, dtype='float64')
+    except (TypeError, ValueError):
+        return None
+    if array.ndim not in (1, 2) or array.size < MIN_TYPED_ARRAY_LENGTH or not all_numbers(values):
+        return None
+
+    finite = array[np.isfinite(array)]
+    if len(finite) == array.size and np.array_equal(finite, np.round(finite)):
+        dtype, converted = next(
+            ((name, array.astype(kind)) for name, kind in INT_DTYPES
+             if np.iinfo(kind).min <= finite.min(initial=0) and finite.max(initial=0) <= np.iinfo(kind).max),
+            ('f8', array),
+        )
+    else:
+        single = array.astype('float32')
+        with np.errstate(invalid='ignore', over='ignore'):
+            fits = np.allclose(single, array, rtol=FLOAT32_RTOL, atol=0, equal_nan=True)
+        dtype, converted = ('f4', single) if fits else ('f8', array)
+
+    encoded = {'dtype': dtype, 'bdata': base64.b64encode(converted.astype(f'<{dtype}').tobytes()).decode('ascii')}
+    if array.ndim == 2:
+        encoded['shape'] = f'{array.shape[0]},{array.shape[1]}'
+    return encoded
+
+
+# Function to check a (possibly nested) list holds only numbers and None; bools and strings stay as JSON
+def all_numbers(values):
+    for value in values:
+        if isinstance(value, list):
+            if not all_numbers(value):
+                return False
+        elif value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return False
+    return True
+
+
+# Function to replace every numeric data array in a trace (including nested ones like marker.size) with a typed array
+def compact_trace(trace):
+    compacted = {}
+    for key, value in trace.items():
+        if key in SKIPPED_KEYS:
+            compacted[key] = value
+        elif isinstance(value, dict):
+            compacted[key] = compact_trace(value)
+        elif isinstance(value, list):
+            compacted[key] = encode_array(value) or value
+        else:
+            compacted[key] = value
+    return compacted
+
+
+# The layout template Plotly attaches to every figure, sent to the browser once (see assets/compact_figures.js)
+def shared_template():
+    return json.loads(pio.to_json(go.Figure(), validate=False))['layout']['template']
+
+
+# Function to turn a serialized figure into the compact wire format: numeric trace data as base64 typed arrays,
+# and the layout template left out when it's the shared one. assets/compact_figures.js expands it again.
+def compact_figure(figure, template=None):
+    layout = figure.get('layout', {})
+    if template is not None and layout.get('template') == template:
+        layout = {key: value for key, value in layout.items() if key != 'template'}
+    return {**figure, 'data': [compact_trace(trace) for trace in figure.get('data', [])], 'layout': layout}